@@ -0,0 +1,269 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from artifacts import load_artifact
+from data_loader import METRICS, dataset_signature
+from region_index import get_hierarchy_index, segments
+
+
+def _prefix(values):
+    """Prefix sums with a leading zero row: total of [lo, hi) is P[hi] - P[lo]."""
+    out = np.zeros((len(values) + 1,) + values.shape[1:], dtype=values.dtype)
+    np.cumsum(values, axis=0, out=out[1:])
+    return out
+
+
+class _RangeArgmax:
+    """Range max + first argmax for every column, answered in O(1) blocks.
+
+    Rows are grouped in fixed-size blocks; a sparse table over the block
+    maxima covers the whole blocks of a query and the two ragged ends are
+    scanned directly. Ties resolve to the earliest row, like idxmax.
+    """
+
+    def __init__(self, values, block=32):
+        self.block = block
+        # NaN tidak boleh menang, ganti dengan -inf
+        self.values = np.where(np.isnan(values), -np.inf, values)
+        n, m = self.values.shape
+        n_blocks = n // block
+        blocks = self.values[:n_blocks * block].reshape(n_blocks, block, m)
+        arg = blocks.argmax(axis=1)
+        level_pos = arg + (np.arange(n_blocks) * block)[:, None]
+        level_val = np.take_along_axis(blocks, arg[:, None, :], axis=1)[:, 0, :]
+
+        self.levels = [(level_val, level_pos)]
+        span = 1
+        while 2 * span <= n_blocks:
+            val, pos = self.levels[-1]
+            later = val[span:] > val[:-span]
+            self.levels.append((np.where(later, val[span:], val[:-span]),
+                                np.where(later, pos[span:], pos[:-span])))
+            span *= 2
+
+    def _scan(self, lo, hi):
+        segment = self.values[lo:hi]
+        arg = segment.argmax(axis=0)
+        return segment[arg, np.arange(segment.shape[1])], arg + lo
+
+    def query(self, lo, hi):
+        """(max values, positions) over rows [lo, hi); position -1 if all NaN."""
+        m = self.values.shape[1]
+        if hi <= lo:
+            return np.full(m, np.nan), np.full(m, -1)
+
+        first_block = -(-lo // self.block)
+        last_block = hi // self.block
+        if first_block >= last_block:
+            best_val, best_pos = self._scan(lo, hi)
+        else:
+            # Urutan kandidat dari kiri ke kanan; kandidat kanan hanya menang jika lebih besar
+            candidates = []
+            if lo < first_block * self.block:
+                candidates.append(self._scan(lo, first_block * self.block))
+            k = int(np.log2(last_block - first_block))
+            val, pos = self.levels[k]
+            candidates.append((val[first_block], pos[first_block]))
+            candidates.append((val[last_block - 2 ** k], pos[last_block - 2 ** k]))
+            if last_block * self.block < hi:
+                candidates.append(self._scan(last_block * self.block, hi))
+
+            best_val, best_pos = candidates[0]
+            for val, pos in candidates[1:]:
+                later = val > best_val
+                best_val = np.where(later, val, best_val)
+                best_pos = np.where(later, pos, best_pos)
+
+        missing = np.isneginf(best_val)
+        return np.where(missing, np.nan, best_val), np.where(missing, -1, best_pos)
+
+
+class AggregateCube:
+    """Per-region statistics for arbitrary date ranges without rescanning rows.
+
+    Built once per dataset version on top of a HierarchyIndex:
+
+    - prefix sums/counts over the (region, date) order give range sums,
+      counts and means in O(1);
+    - a second prefix layout ordered by (region, weekday, date) gives the
+      per-weekday sums/counts used by the residential chart;
+    - block sparse tables give range max/min and the date of the first
+      extreme (the same row idxmax/idxmin would pick).
+    """
+
+    def __init__(self, index, metrics=METRICS):
+        self.index = index
+        self.metrics = list(metrics)
+        frame = index.frame
+        values = frame[self.metrics].to_numpy(dtype='float64', na_value=np.nan)
+        valid = ~np.isnan(values)
+
+        self._sums = _prefix(np.where(valid, values, 0.0))
+        self._counts = _prefix(valid.astype(np.int64))
+        self._max = _RangeArgmax(values)
+        self._min = _RangeArgmax(-values)
+
+        # Tata letak kedua: region -> hari -> tanggal
+        block_ids = np.full(len(frame), -1)
+        regions = list(index.blocks)
+        for block_id, region in enumerate(regions):
+            start, stop = index.blocks[region]
+            block_ids[start:stop] = block_id
+        weekday = frame['date'].dt.weekday.to_numpy()
+        order = np.lexsort((weekday, block_ids))
+        keys = (block_ids * 7 + weekday)[order]
+
+        self._wk_dates = index.dates[order]
+        self._wk_sums = _prefix(np.where(valid, values, 0.0)[order])
+        self._wk_counts = _prefix(valid[order].astype(np.int64))
+        self._wk_blocks = {}
+        boundaries = np.flatnonzero(np.diff(keys)) + 1
+        for start, stop in zip(np.concatenate(([0], boundaries)), np.concatenate((boundaries, [len(keys)]))):
+            if block_ids[order[start]] >= 0:
+                self._wk_blocks[(regions[keys[start] // 7], keys[start] % 7)] = (start, stop)
+
+    def _column(self, metric):
+        return self.metrics.index(metric)
+
+    def _dates_at(self, positions):
+        dates = self.index.dates
+        return np.where(positions >= 0, dates[positions], np.datetime64('NaT'))
+
+    def extrema(self, region, start_date, end_date, metric):
+        """(max, max_date, min, min_date) of one metric inside the window."""
+        column = self._column(metric)
+        lo, hi = self.index.bounds(region, start_date, end_date)
+        max_val, max_pos = self._max.query(lo, hi)
+        min_val, min_pos = self._min.query(lo, hi)
+        return (max_val[column], pd.Timestamp(self._dates_at(max_pos)[column]),
+                -min_val[column], pd.Timestamp(self._dates_at(min_pos)[column]))
+
+    def children_totals(self, parent, start_date, end_date, metric):
+        """(child paths, window sums, window counts) of one metric for every child of `parent`."""
+        column = self._column(metric)
+        children, lo, hi = self.index.child_bounds(parent, start_date, end_date)
+        sums = self._sums[hi, column] - self._sums[lo, column]
+        counts = self._counts[hi, column] - self._counts[lo, column]
+        return children, sums, counts
+
+    def children_summary(self, parent, start_date, end_date, metric):
+        """Window mean and row count of one metric for every child of `parent`.
+
+        Needs a HierarchyIndex; switching parent or window is a lookup into
+        the prefix sums, never a rescan of the rows.
+        """
+        return _children_frame(self.index, parent, *self.children_totals(parent, start_date, end_date, metric))
+
+    def weekday_totals(self, region, start_date, end_date, metric):
+        """{weekday (0 = Monday): (sum, count)} of `metric` for the weekdays with rows in the window."""
+        column = self._column(metric)
+        start = pd.Timestamp(start_date).to_datetime64()
+        end = pd.Timestamp(end_date).to_datetime64()
+        totals = {}
+        for weekday in range(7):
+            if (region, weekday) not in self._wk_blocks:
+                continue
+            block_start, block_stop = self._wk_blocks[(region, weekday)]
+            dates = self._wk_dates[block_start:block_stop]
+            lo = block_start + np.searchsorted(dates, start, side='left')
+            hi = block_start + np.searchsorted(dates, end, side='right')
+            if hi <= lo:
+                continue
+            totals[weekday] = (self._wk_sums[hi, column] - self._wk_sums[lo, column],
+                               self._wk_counts[hi, column] - self._wk_counts[lo, column])
+        return totals
+
+    def weekday_mean(self, region, start_date, end_date, metric):
+        """Mean of `metric` per weekday (0 = Monday) inside the window, from prefix sums."""
+        return _weekday_series(self.weekday_totals(region, start_date, end_date, metric), metric)
+
+
+def _children_frame(index, parent, children, sums, counts):
+    return pd.DataFrame({
+        'mean': np.divide(sums, counts, out=np.full(len(sums), np.nan), where=counts > 0),
+        'count': counts,
+    }, index=pd.Index([child[-1] for child in children], name=index.levels[len(parent)]))
+
+
+def _weekday_series(totals, metric):
+    means = {weekday: total / count if count else np.nan for weekday, (total, count) in totals.items()}
+    result = pd.Series(means, name=metric, dtype='float64')
+    result.index.name = 'date'
+    return result
+
+
+class CubeChain:
+    """The AggregateCubes of an IndexChain's segments, answered as one cube.
+
+    Segments cover consecutive date ranges, so window sums and counts add
+    up across them and an extreme is the best per-segment extreme, the
+    earlier segment winning ties (the first row, like idxmax). Extending
+    the chain builds a cube over the new segment only.
+    """
+
+    def __init__(self, index, cubes):
+        self.index = index
+        self.cubes = list(cubes)
+        self.metrics = self.cubes[0].metrics
+
+    def extrema(self, region, start_date, end_date, metric):
+        """(max, max_date, min, min_date) of one metric inside the window."""
+        best = None
+        for cube in self.cubes:
+            max_val, max_date, min_val, min_date = cube.extrema(region, start_date, end_date, metric)
+            if best is None:
+                best = [max_val, max_date, min_val, min_date]
+                continue
+            if not np.isnan(max_val) and (np.isnan(best[0]) or max_val > best[0]):
+                best[:2] = max_val, max_date
+            if not np.isnan(min_val) and (np.isnan(best[2]) or min_val < best[2]):
+                best[2:] = min_val, min_date
+        return tuple(best)
+
+    def children_summary(self, parent, start_date, end_date, metric):
+        """Window mean and row count of one metric for every child of `parent`."""
+        children = self.index.children.get(parent, [])
+        positions = {child: i for i, child in enumerate(children)}
+        sums, counts = np.zeros(len(children)), np.zeros(len(children), dtype=np.int64)
+        for cube in self.cubes:
+            found, cube_sums, cube_counts = cube.children_totals(parent, start_date, end_date, metric)
+            at = [positions[child] for child in found]
+            sums[at] += cube_sums
+            counts[at] += cube_counts
+        return _children_frame(self.index, parent, children, sums, counts)
+
+    def weekday_mean(self, region, start_date, end_date, metric):
+        """Mean of `metric` per weekday (0 = Monday) inside the window."""
+        totals = {}
+        for cube in self.cubes:
+            for weekday, (total, count) in cube.weekday_totals(region, start_date, end_date, metric).items():
+                previous_total, previous_count = totals.get(weekday, (0.0, 0))
+                totals[weekday] = (previous_total + total, previous_count + count)
+        return _weekday_series(dict(sorted(totals.items())), metric)
+
+
+def cube_for(index, previous=None):
+    """AggregateCube (or CubeChain) over `index`, reusing the cubes of `previous` for segments they cover."""
+    built = {id(cube.index): cube for cube in getattr(previous, 'cubes', [previous]) if cube is not None}
+    cubes = [built.get(id(segment)) or AggregateCube(segment) for segment in segments(index)]
+    return cubes[0] if len(cubes) == 1 else CubeChain(index, cubes)
+
+
+# Cube terakhir yang dibangun di proses ini; cube segmen lamanya dipakai lagi
+_latest = {}
+
+
+@lru_cache(maxsize=1)
+def _build(signature):
+    cube = load_artifact('aggregate_cube', signature)
+    if cube is None:
+        cube = cube_for(get_hierarchy_index(), _latest.get('cube'))
+    _latest['cube'] = cube
+    return cube
+
+
+def get_aggregate_cube():
+    """AggregateCube over the current dataset's hierarchy (keys are region paths)."""
+    return _build(dataset_signature())
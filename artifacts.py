@@ -0,0 +1,95 @@
+"""Read side of the precomputed artifact directory (see precompute.py).
+
+precompute.py writes everything the dashboard would otherwise build on the
+first request into cache/artifacts/<version>/: pickled indexes and
+aggregates, and the per-region charts as Plotly JSON. The version combines
+the dataset version with a hash of the modules whose objects are stored,
+so a code change never unpickles objects of an older class layout. A
+directory counts only once its manifest exists (written last); without it
+every lookup returns None and the caller builds as usual; only
+precompute.py's own workers read the objects earlier, through
+staged_objects().
+"""
+import hashlib
+import json
+import pickle
+from functools import lru_cache
+
+from data_loader import BASE_DIR, CACHE_DIR, dataset_version
+
+ARTIFACTS_DIR = CACHE_DIR / "artifacts"
+MANIFEST = "manifest.json"
+# Satu pickle untuk semua objek: AggregateCube merujuk HierarchyIndex, referensi bersama tetap satu objek
+OBJECTS = "objects.pkl"
+# Modul yang objeknya di-pickle atau grafiknya diserialisasi
+SOURCE_MODULES = ('data_loader.py', 'region_index.py', 'aggregates.py', 'comparison.py', 'timeseries.py',
+                  'downsample.py', 'figures.py', 'charts.py')
+
+
+@lru_cache(maxsize=1)
+def code_version():
+    digest = hashlib.sha1()
+    for name in SOURCE_MODULES:
+        digest.update((BASE_DIR / name).read_bytes())
+    return digest.hexdigest()[:8]
+
+
+def artifact_version(signature=None):
+    return f"{dataset_version(signature)}-{code_version()}"
+
+
+def artifact_dir(signature=None):
+    return ARTIFACTS_DIR / artifact_version(signature)
+
+
+def chart_name(chart, key):
+    """File name of a serialized chart; keys are tuples of plain values, so repr() is stable."""
+    return f"{chart}-{hashlib.sha1(repr(key).encode()).hexdigest()[:16]}.json"
+
+
+@lru_cache(maxsize=1)
+def _manifest(directory):
+    path = directory / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def manifest(signature=None):
+    """Manifest of the complete artifact directory for the current data and code, or None."""
+    directory = artifact_dir(signature)
+    if not (directory / MANIFEST).exists():
+        return None
+    return _manifest(directory)
+
+
+@lru_cache(maxsize=1)
+def _objects(directory):
+    try:
+        with open(directory / OBJECTS, 'rb') as handle:
+            return pickle.load(handle)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        # Artefak rusak atau tidak cocok: semuanya dibangun seperti biasa
+        return {}
+
+
+def staged_objects(directory):
+    """Objects pickled into `directory`, whether or not its manifest exists yet (for precompute workers)."""
+    return _objects(directory)
+
+
+def load_artifact(name, signature=None):
+    """Precomputed object `name` (e.g. 'hierarchy_index'), or None."""
+    if manifest(signature) is None:
+        return None
+    return _objects(artifact_dir(signature)).get(name)
+
+
+def load_chart(chart, key):
+    """Prebuilt figure for (chart, key), or None."""
+    if manifest() is None:
+        return None
+    path = artifact_dir() / "charts" / chart_name(chart, key)
+    if not path.exists():
+        return None
+    import plotly.io
+
+    return plotly.io.from_json(path.read_text())
@@ -0,0 +1,101 @@
+"""Check AggregateCube against the dashboard's pandas statistics and time both.
+
+Run from the repository root:
+
+    python -m benchmarks.aggregates_bench [--windows 50]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregateCube
+from data_loader import METRICS, load_mobility_data
+from region_index import HierarchyIndex
+
+
+def pandas_stats(filtered_df, metric):
+    return (filtered_df[metric].max(),
+            filtered_df.loc[filtered_df[metric].idxmax(), 'date'],
+            filtered_df[metric].min(),
+            filtered_df.loc[filtered_df[metric].idxmin(), 'date'])
+
+
+def pandas_weekday_mean(filtered_df, metric):
+    return filtered_df.groupby(filtered_df['date'].dt.weekday)[metric].mean()
+
+
+def provinces(index):
+    """Province paths, the keys the dashboard looks the cube up with."""
+    return [(name,) for name in index.regions]
+
+
+def random_windows(df, count, rng):
+    min_date, max_date = df['date'].min(), df['date'].max()
+    days = (max_date - min_date).days
+    windows = [(min_date, max_date), (min_date, min_date), (max_date, max_date)]
+    for _ in range(count):
+        offset = int(rng.integers(days))
+        length = int(rng.integers(0, days - offset + 1))
+        start = min_date + pd.Timedelta(days=offset)
+        windows.append((start, start + pd.Timedelta(days=length)))
+    return windows
+
+
+def verify(index, cube, windows):
+    checked = 0
+    for region in provinces(index):
+        for start, end in windows:
+            filtered_df = index.query(region, start, end)
+            if filtered_df.empty:
+                continue
+            for metric in METRICS:
+                if filtered_df[metric].notna().any():
+                    assert cube.extrema(region, start, end, metric) == pandas_stats(filtered_df, metric), \
+                        (region, start, end, metric)
+                # Float64 (NA) dari pandas dibandingkan sebagai float64 (NaN)
+                expected = pandas_weekday_mean(filtered_df, metric).astype('float64')
+                pd.testing.assert_series_equal(cube.weekday_mean(region, start, end, metric), expected,
+                                               check_exact=True, check_index_type=False)
+                checked += 1
+    return checked
+
+
+def run(windows_count):
+    df = load_mobility_data()
+    index = HierarchyIndex(df)
+
+    start = time.perf_counter()
+    cube = AggregateCube(index)
+    build = time.perf_counter() - start
+
+    windows = random_windows(df, windows_count, np.random.default_rng(7))
+    checked = verify(index, cube, windows)
+    print(f"build: {build * 1000:.1f} ms, {checked:,} region/window/metric cases match pandas exactly")
+
+    def per_rerun_pandas(region, start, end):
+        filtered_df = index.query(region, start, end)
+        for metric in METRICS[:2] + [METRICS[4]]:
+            pandas_stats(filtered_df, metric)
+        pandas_weekday_mean(filtered_df, METRICS[5])
+
+    def per_rerun_cube(region, start, end):
+        for metric in METRICS[:2] + [METRICS[4]]:
+            cube.extrema(region, start, end, metric)
+        cube.weekday_mean(region, start, end, METRICS[5])
+
+    for name, func in (('pandas', per_rerun_pandas), ('cube', per_rerun_cube)):
+        start = time.perf_counter()
+        for region in provinces(index):
+            for window in windows:
+                func(region, *window)
+        elapsed = (time.perf_counter() - start) / (len(index.regions) * len(windows))
+        print(f"{name:>7}: {elapsed * 1000:.3f} ms per rerun")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--windows", type=int, default=50)
+    args = parser.parse_args()
+    run(args.windows)
@@ -0,0 +1,41 @@
+"""Wall time of the full k sweep with 1..N pool workers.
+
+Run from the repository root:
+
+    python -m benchmarks.cluster_sweep_bench [--workers 1 2 4]
+
+Each run fits every k of K_VALUES for every (year, region) scope from the
+shared-memory matrix, the same work the dashboard's "Run sweep" button
+starts. Results are not saved, so every run starts cold. Worker counts
+above the usable cores are skipped.
+"""
+import argparse
+import time
+
+import cluster_sweep
+from cluster_sweep import K_VALUES, SweepJob, worker_count
+from data_loader import load_mobility_data
+
+
+def run(workers_list):
+    years = sorted(int(year) for year in load_mobility_data()['year'].unique())
+    # Tanpa menyimpan hasil: tiap putaran harus menghitung ulang semuanya
+    cluster_sweep.save_sweep = lambda key, result: None
+    print(f"{'workers':>8} {'scopes':>7} {'seconds':>9}")
+    for workers in workers_list:
+        if workers > worker_count():
+            print(f"{workers:>8}  skipped ({worker_count()} usable cores)")
+            continue
+        start = time.perf_counter()
+        job = SweepJob(f"bench-{workers}", years, K_VALUES, workers=workers)
+        status = job.join()
+        if status != 'done':
+            raise RuntimeError(f"sweep {status}: {job.error}")
+        print(f"{workers:>8} {job.total:>7} {time.perf_counter() - start:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    run(args.workers)
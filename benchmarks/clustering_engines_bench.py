@@ -0,0 +1,67 @@
+"""Quality vs speed of the streaming (minibatch) clustering engine against exact KMeans.
+
+Run from the repository root:
+
+    python -m benchmarks.clustering_engines_bench [--chunk-size 4096]
+"""
+import argparse
+import time
+import tracemalloc
+
+from scipy.optimize import linear_sum_assignment
+from sklearn.metrics import adjusted_rand_score
+
+from clustering import (FEATURES, N_CLUSTERS, feature_matrix, fit_model, fit_streaming_model,
+                        iter_chunks, iter_columnar_chunks)
+from data_loader import load_mobility_data
+
+
+def measured(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def centroid_shift(exact, streaming):
+    """Mean distance between matched centroids, in the exact model's scaled space."""
+    raw = streaming.centroids * streaming.scaler_scale + streaming.scaler_mean
+    mapped = (raw - exact.scaler_mean) / exact.scaler_scale
+    cost = ((exact.centroids[:, None, :] - mapped[None, :, :]) ** 2).sum(axis=2) ** 0.5
+    rows, cols = linear_sum_assignment(cost)
+    return cost[rows, cols].mean()
+
+
+def run(chunk_size):
+    df = load_mobility_data()
+    print(f"{'year':>4} {'source':>9} {'exact ms':>9} {'stream ms':>10} {'exact MB':>9} {'stream MB':>10} "
+          f"{'inertia +%':>11} {'centroid d':>11} {'ARI':>6}")
+    for year in sorted(int(year) for year in df['year'].unique()):
+        _, X = feature_matrix(df, year)
+        exact, exact_time, exact_peak = measured(lambda: fit_model(X, year))
+        sources = {
+            'memory': lambda: iter_chunks(X, chunk_size),
+            'feather': lambda: iter_columnar_chunks(year, FEATURES, chunk_size),
+        }
+        for source, chunks in sources.items():
+            streaming, stream_time, stream_peak = measured(
+                lambda: fit_streaming_model(chunks, year, FEATURES, N_CLUSTERS))
+            assert len(streaming.labels) == len(exact.labels)
+            print(f"{year:>4} {source:>9} {exact_time * 1000:>9.1f} {stream_time * 1000:>10.1f} "
+                  f"{exact_peak / 1e6:>9.2f} {stream_peak / 1e6:>10.2f} "
+                  f"{(streaming.inertia / exact.inertia - 1) * 100:>10.2f}% "
+                  f"{centroid_shift(exact, streaming):>11.3f} "
+                  f"{adjusted_rand_score(exact.labels, streaming.labels):>6.3f}")
+    print("\nmemory = chunks of the in-memory matrix; feather = chunks read from the columnar parts,")
+    print("the source get_clustering() uses for the minibatch engine.")
+    print("MB = peak traced allocations during the fit; the exact engine also needs X itself.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    args = parser.parse_args()
+    run(args.chunk_size)
@@ -0,0 +1,77 @@
+"""Compare N regions from the RegionTensor vs one frame filter per region.
+
+Run from the repository root:
+
+    python -m benchmarks.comparison_bench [--factors 1 10] [--counts 1 5 10 34]
+
+The per-region baseline is what a comparison would cost with the original
+dashboard code: a boolean mask per region, then a pivot and a groupby mean
+for the ranking. Scaled runs stack synthetic copies of the data (see
+benchmarks.synthetic), so there are 34 x factor provinces to choose from.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import scale_frame
+from comparison import RegionTensor
+from data_loader import METRICS, load_mobility_data
+from figures import WORKPLACES
+from region_index import HierarchyIndex
+
+
+def per_region(df, regions, start_date, end_date, metric):
+    windows = []
+    for region in regions:
+        windows.append(df[(df['sub_region_1'] == region) &
+                          (df['date'] >= start_date) & (df['date'] <= end_date)])
+    window = pd.concat(windows)
+    wide = window.pivot(index='date', columns='sub_region_1', values=metric)
+    ranking = window.groupby('sub_region_1', observed=True)[METRICS].mean().sort_values(metric, ascending=False)
+    return wide, ranking
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(factors, counts, repeat):
+    base = load_mobility_data()
+    start_date, end_date = pd.Timestamp('2020-03-01'), pd.Timestamp('2022-10-01')
+    rng = np.random.default_rng(42)
+
+    print(f"{'scale':>6} {'regions':>8} {'build ms':>9} {'filters ms':>11} {'tensor ms':>10} {'speedup':>8}")
+    for factor in factors:
+        df = scale_frame(base, factor)
+        start = time.perf_counter()
+        tensor = RegionTensor(HierarchyIndex(df))
+        build = time.perf_counter() - start
+
+        for count in counts:
+            regions = list(rng.choice(tensor.regions, size=min(count, len(tensor.regions)), replace=False))
+            wide, ranking = per_region(df, regions, start_date, end_date, WORKPLACES)
+            got = tensor.ranking(regions, start_date, end_date, WORKPLACES)
+            assert np.allclose(got.loc[ranking.index, METRICS].to_numpy(), ranking.to_numpy(dtype='float64'),
+                               equal_nan=True)
+
+            filters = best_of(lambda: per_region(df, regions, start_date, end_date, WORKPLACES), repeat)
+            lookup = best_of(lambda: (tensor.series(regions, start_date, end_date, WORKPLACES),
+                                      tensor.ranking(regions, start_date, end_date, WORKPLACES)), repeat)
+            print(f"{factor:>5}x {len(regions):>8} {build * 1000:>9.1f} {filters * 1000:>11.2f} "
+                  f"{lookup * 1000:>10.2f} {filters / lookup:>7.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 5, 10, 34])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.factors, args.counts, args.repeat)
@@ -0,0 +1,75 @@
+"""Plotly payload size and build time of the time-series charts, with and without downsampling.
+
+Run from the repository root:
+
+    python -m benchmarks.downsample_bench [--budgets 250 500 1000] [--repeat 10]
+
+"Long" stacks every region's series end to end (about 33k days), standing
+in for multi-year or multi-region ranges. Browser render time cannot be
+measured headlessly; build + to_json time is the server-side share of it,
+and payload size drives the browser side.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_mobility_data
+from figures import GROCERY, RETAIL, WORKPLACES, retail_grocery_figure, workplace_change_figure, workplace_figure
+from region_index import HierarchyIndex
+
+
+def extrema(df, metric):
+    series = df[metric]
+    return (series.max(), df.loc[series.idxmax(), 'date'], series.min(), df.loc[series.idxmin(), 'date'])
+
+
+def build_all(df, budget):
+    figures = {
+        'fig1': retail_grocery_figure(df, extrema(df, RETAIL), extrema(df, GROCERY), budget),
+        'fig2': workplace_figure(df, extrema(df, WORKPLACES), budget),
+        'increase': workplace_change_figure(df[df[WORKPLACES] > 0], "Increase", budget),
+        'decrease': workplace_change_figure(df[df[WORKPLACES] < 0], "Decrease", budget),
+    }
+    return {name: fig.to_json() for name, fig in figures.items()}
+
+
+def check_extrema_kept(df, budget):
+    """The downsampled traces still contain every series' max and min."""
+    fig = retail_grocery_figure(df, extrema(df, RETAIL), extrema(df, GROCERY), budget)
+    for trace, metric in zip(fig.data[:2], (RETAIL, GROCERY)):
+        y = np.asarray(trace.y, dtype='float64')
+        assert np.nanmax(y) == df[metric].max() and np.nanmin(y) == df[metric].min(), metric
+    fig = workplace_figure(df, extrema(df, WORKPLACES), budget)
+    y = np.asarray(fig.data[0].y, dtype='float64')
+    assert np.nanmax(y) == df[WORKPLACES].max() and np.nanmin(y) == df[WORKPLACES].min()
+
+
+def run(budgets, repeat):
+    data = load_mobility_data()
+    index = HierarchyIndex(data)
+    single = index.query((index.regions[0],), data['date'].min(), data['date'].max())
+    long = pd.concat([index.query((r,), data['date'].min(), data['date'].max()) for r in index.regions])
+    long = long.assign(date=pd.date_range('1950-01-01', periods=len(long), freq='D'))
+
+    print(f"{'series':>7} {'budget':>7} {'rows':>7} {'payload KB':>11} {'build+json ms':>14}")
+    for name, df in (('region', single), ('long', long)):
+        for budget in [None] + budgets:
+            if budget is not None:
+                check_extrema_kept(df, budget)
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                payloads = build_all(df, budget)
+                timings.append(time.perf_counter() - start)
+            size = sum(len(p) for p in payloads.values())
+            print(f"{name:>7} {str(budget or 'full'):>7} {len(df):>7} {size / 1024:>11.1f} {min(timings) * 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budgets", type=int, nargs="+", default=[250, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.budgets, args.repeat)
@@ -0,0 +1,159 @@
+"""Cost of adding one month of mobility data: incremental sync vs full re-ingest.
+
+Run from the repository root:
+
+    python -m benchmarks.ingest_bench [--days 30] [--factors 1 10 100]
+
+Works on copies of the bundled reports in a temporary directory. The last
+`--days` days are cut from the newest report, the store is synced, then
+those days are appended to the file and the store is synced again. The
+second sync should parse only the appended rows; it is compared with a
+full re-ingest of every report, and the resulting frame is checked
+against one parsed straight from the CSVs, every column included. Each
+of `--factors` repeats the older reports under extra years so the history
+is that many times longer while the appended month stays the same size.
+Finally one value in the middle of the report is edited in place (same
+length) and a row appended; that sync must notice and re-parse the report.
+
+The derived structures get the same treatment: the hierarchy index,
+aggregate cube and region tensor of the history are extended with the
+appended part (region_index.extend_index and friends) and compared, query
+by query, with the same structures rebuilt over every part.
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregateCube, cube_for
+from comparison import RegionTensor, tensor_for
+from data_loader import (DATASET_DIR, compact_frame, dataset_files, dataset_signature, read_columnar,
+                         read_csv_frame, sync_columnar_store)
+from region_index import HierarchyIndex, extend_index
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def assert_same_rows(frame, expected):
+    keys = ['sub_region_1', 'date', 'place_id']
+    pd.testing.assert_frame_equal(
+        frame.sort_values(keys).reset_index(drop=True),
+        expected.sort_values(keys).reset_index(drop=True),
+    )
+
+
+def build_derived(frame):
+    index = HierarchyIndex(frame)
+    return index, AggregateCube(index), RegionTensor(index)
+
+
+def assert_same_answers(extended, rebuilt, start, end):
+    """Every province query of the extended structures matches the rebuilt ones."""
+    (index, cube, tensor), (full_index, full_cube, full_tensor) = extended, rebuilt
+    assert index.paths == full_index.paths and index.rollups == full_index.rollups
+    windows = [(start, end), (end - pd.Timedelta(days=60), end), (start, start + pd.Timedelta(days=90))]
+    for window in windows:
+        for region in index.regions:
+            path = (region,)
+            pd.testing.assert_frame_equal(index.query(path, *window).reset_index(drop=True),
+                                          full_index.query(path, *window).reset_index(drop=True))
+            for metric in cube.metrics:
+                # Tanpa nilai di jendela: (NaN, NaT, NaN, NaT), dibandingkan sebagai Series agar NaN == NaN
+                pd.testing.assert_series_equal(pd.Series(cube.extrema(path, *window, metric)),
+                                               pd.Series(full_cube.extrema(path, *window, metric)))
+            pd.testing.assert_series_equal(cube.weekday_mean(path, *window, cube.metrics[-1]),
+                                           full_cube.weekday_mean(path, *window, cube.metrics[-1]))
+        for metric in cube.metrics:
+            pd.testing.assert_frame_equal(cube.children_summary((), *window, metric),
+                                          full_cube.children_summary((), *window, metric))
+            pd.testing.assert_frame_equal(tensor.ranking(tensor.regions, *window, metric),
+                                          full_tensor.ranking(full_tensor.regions, *window, metric))
+    assert np.array_equal(tensor.values, full_tensor.values, equal_nan=True)
+
+
+def run(days, factor):
+    files = [path for _, path in dataset_files(DATASET_DIR)]
+    newest = files[-1]
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset, store = Path(tmp) / "dataset", Path(tmp) / "parts"
+        dataset.mkdir()
+        for path in files[:-1]:
+            shutil.copy(path, dataset / path.name)
+        # Riwayat lebih panjang: laporan lama disalin sebagai tahun-tahun sebelumnya
+        for copy in range(1, factor):
+            for path in files[:-1]:
+                shutil.copy(path, dataset / f"{1900 + 10 * copy + files.index(path)}_{path.name.split('_', 1)[1]}")
+
+        # Laporan terbaru tanpa `days` hari terakhir, lalu hari-hari itu ditambahkan di akhir file
+        lines = newest.read_text().splitlines(keepends=True)
+        header, rows = lines[0], lines[1:]
+        cutoff = str((pd.Timestamp(max(row.split(',')[8] for row in rows)) - pd.Timedelta(days=days)).date())
+        old = [row for row in rows if row.split(',')[8] <= cutoff]
+        new = [row for row in rows if row.split(',')[8] > cutoff]
+        target = dataset / newest.name
+        target.write_text(header + "".join(old))
+
+        history, initial = timed(lambda: sync_columnar_store(dataset_signature(dataset), dataset, store))
+        with open(target, 'a') as handle:
+            handle.write("".join(new))
+        signature = dataset_signature(dataset)
+        parts, incremental = timed(lambda: sync_columnar_store(signature, dataset, store))
+        frame, load = timed(lambda: read_columnar(parts))
+
+        # Urutan baris berbeda (bulan baru ada di part terpisah), jadi dibandingkan setelah diurutkan
+        expected = compact_frame(read_csv_frame(signature, dataset))
+        assert_same_rows(frame, expected)
+
+        # Struktur turunan: riwayat diperpanjang dengan part baru vs dibangun ulang dari semua part
+        index, cube, tensor = build_derived(read_columnar(history))
+        appended = read_columnar([path for path in parts if path not in history])
+        extended, extend = timed(lambda: (lambda chain: (chain, cube_for(chain, cube), tensor_for(chain, tensor)))(
+            extend_index(index, appended)))
+        rebuilt, rebuild = timed(lambda: build_derived(frame))
+        assert_same_answers(extended, rebuilt, frame['date'].min(), frame['date'].max())
+
+        # Suntingan di tengah file dengan panjang sama, lalu satu baris baru: file harus di-parse ulang
+        data = bytearray(target.read_bytes())
+        start = data.index(b"\n", len(data) // 2) + 1
+        while True:
+            end = data.index(b"\n", start)
+            # Digit pertama dari nilai metrik (kolom sesudah tanggal) pada baris yang punya nilai
+            metrics_at = start + len(b",".join(data[start:end].split(b",")[:9])) + 1
+            digit = next((i for i in range(metrics_at, end) if data[i:i + 1].isdigit()), None)
+            if digit is not None:
+                break
+            start = end + 1
+        data[digit:digit + 1] = b"8" if data[digit:digit + 1] != b"8" else b"9"
+        target.write_bytes(bytes(data) + new[-1].encode())
+        edited = dataset_signature(dataset)
+        edited_parts, reparse = timed(lambda: sync_columnar_store(edited, dataset, store))
+        assert_same_rows(read_columnar(edited_parts), compact_frame(read_csv_frame(edited, dataset)))
+
+        shutil.rmtree(store)
+        _, full = timed(lambda: sync_columnar_store(edited, dataset, store))
+
+    print(f"factor {factor}: history: {len(expected) - len(new):,} rows in {len(list(signature))} reports, appended {len(new):,} rows")
+    print(f"initial ingest:     {initial * 1000:8.1f} ms")
+    print(f"append {days:>3} days:    {incremental * 1000:8.1f} ms  (parses only the new lines)")
+    print(f"extend derived:     {extend * 1000:8.1f} ms  (index, cube and tensor of the new part)")
+    print(f"rebuild derived:    {rebuild * 1000:8.1f} ms  (same structures over every part)")
+    print(f"in-place edit:      {reparse * 1000:8.1f} ms  (detected, report re-parsed)")
+    print(f"full re-ingest:     {full * 1000:8.1f} ms")
+    print(f"load parts:         {load * 1000:8.1f} ms  ({len(parts)} parts)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+    for factor in args.factors:
+        run(args.days, factor)
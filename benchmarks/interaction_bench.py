@@ -0,0 +1,213 @@
+"""End-to-end latency of each dashboard interaction, measured headlessly with AppTest.
+
+Run from the repository root:
+
+    python -m benchmarks.interaction_bench [--script dashboard.py] [--repeat 5]
+
+Every interaction changes one widget and times AppTest.run(), twice:
+
+- full: the whole script reruns, which is what every interaction costs
+  without fragments (and what the sidebar filters and the language toggle
+  always cost);
+- fragment: only the fragment holding the widget reruns, as the browser
+  requests it. AppTest itself always reruns the whole script, so the run
+  is requested with the fragment id Streamlit sent along with the widget.
+
+The widgets of each section are found by the keys declared in
+sections.SECTION_WIDGETS, and the run fails if a declared widget is not
+inside a fragment or a fragment holds a widget that is not declared.
+Widgets that are not on the page (no boundary file, no stored sweep) are
+skipped. Scripts without fragments report the full rerun only.
+"""
+import argparse
+import datetime
+import json
+import statistics
+import time
+import warnings
+from pathlib import Path
+
+from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+from streamlit.testing.v1 import AppTest, local_script_runner
+
+try:
+    from sections import SECTION_WIDGETS
+except ImportError:
+    SECTION_WIDGETS = {}
+
+WIDGET_TYPES = ('button', 'checkbox', 'color_picker', 'date_input', 'multiselect', 'number_input', 'radio',
+                'selectbox', 'slider', 'text_area', 'text_input', 'time_input', 'toggle')
+
+# id elemen -> (jenis, fragment_id) dari pesan yang dikirim skrip; fragment_id kosong = di luar fragment
+_elements = {}
+_original_enqueue = ScriptRunContext.enqueue
+
+
+def _enqueue(self, msg):
+    if msg.HasField('delta') and msg.delta.HasField('new_element'):
+        kind = msg.delta.new_element.WhichOneof('type')
+        element_id = getattr(getattr(msg.delta.new_element, kind), 'id', '')
+        if element_id:
+            _elements[element_id] = (kind, msg.delta.fragment_id)
+    return _original_enqueue(self, msg)
+
+
+ScriptRunContext.enqueue = _enqueue
+
+# Fragment yang dijalankan ulang oleh run() berikutnya (None = seluruh skrip)
+_fragment = {'id': None}
+_RerunData = local_script_runner.RerunData
+
+
+def _rerun_data(**kwargs):
+    if _fragment['id']:
+        kwargs['fragment_id_queue'] = [_fragment['id']]
+    return _RerunData(**kwargs)
+
+
+local_script_runner.RerunData = _rerun_data
+
+
+def _widget(elements, label):
+    return next(e for e in elements if e.label.startswith(label))
+
+
+def _next_option(box):
+    box.select_index((box.index + 1) % len(box.options))
+
+
+def _toggle_language(at, i):
+    _widget(at.button, ("Translate", "Terjemahkan")[at.session_state.language == 'id']).click()
+
+
+def _change_region(at, i):
+    box = _widget(at.selectbox, "Select Region")
+    box.select(box.options[(i + 1) % len(box.options)])
+
+
+def _change_dates(at, i):
+    widget = at.date_input[0]
+    start = datetime.date(2020, 3, 1) + datetime.timedelta(days=30 * (i % 6))
+    widget.set_value((start, start + datetime.timedelta(days=180)))
+
+
+def _change_budget(at, i):
+    _widget(at.slider, "Max points").set_value(200 + 100 * (i % 5))
+
+
+def _change_overlays(at, i):
+    box = _widget(at.multiselect, "Overlays")
+    box.set_value([["7-day mean"], ["7-day mean", "Trend"], []][i % 3])
+
+
+def _change_comparison_regions(at, i):
+    box = at.multiselect(key='comparison_regions')
+    region = box.options[4 + i % 3]
+    box.unselect(region) if region in box.value else box.select(region)
+
+
+def _change_comparison_layout(at, i):
+    at.radio(key='comparison_layout').set_value(["Small multiples", "Overlay"][i % 2])
+
+
+def _change_map_view(at, i):
+    at.radio(key='map_view').set_value(["Animate over time", "Range average"][i % 2])
+
+
+# Filter global: selalu rerun penuh
+GLOBAL_INTERACTIONS = {
+    'language': _toggle_language,
+    'region': _change_region,
+    'date_range': _change_dates,
+    'point_budget': _change_budget,
+    'overlays': _change_overlays,
+}
+
+# Widget section, dicari lewat key yang dideklarasikan di SECTION_WIDGETS
+SECTION_INTERACTIONS = {
+    'seasonality_metric': lambda at, i: _next_option(at.selectbox(key='seasonality_metric')),
+    'drilldown_metric': lambda at, i: _next_option(at.selectbox(key='drilldown_metric')),
+    'comparison_regions': _change_comparison_regions,
+    'comparison_metric': lambda at, i: _next_option(at.selectbox(key='comparison_metric')),
+    'comparison_layout': _change_comparison_layout,
+    'map_metric': lambda at, i: _next_option(at.selectbox(key='map_metric')),
+    'map_view': _change_map_view,
+    'cluster_year': lambda at, i: _next_option(at.selectbox(key='cluster_year')),
+    'cluster_engine': lambda at, i: _next_option(at.selectbox(key='cluster_engine')),
+    'sweep_scope': lambda at, i: _next_option(at.selectbox(key='sweep_scope')),
+    'transition_k': lambda at, i: _next_option(at.selectbox(key='transition_k')),
+}
+
+
+def _fragment_of(key):
+    """Fragment id the widget with user key `key` was sent from, or None if it is not on the page."""
+    for element_id, (_, fragment_id) in _elements.items():
+        if element_id.endswith(f"-{key}"):
+            return fragment_id
+    return None
+
+
+def check_wiring():
+    """Declared widgets sit in fragments, and fragments hold no undeclared widgets."""
+    declared = {key for widgets in SECTION_WIDGETS.values() for key in widgets}
+    for key in declared:
+        if _fragment_of(key) == '':
+            raise AssertionError(f"{key!r} is declared in SECTION_WIDGETS but is not inside a fragment")
+    for element_id, (kind, fragment_id) in _elements.items():
+        if fragment_id and kind in WIDGET_TYPES and not any(element_id.endswith(f"-{key}") for key in declared):
+            raise AssertionError(f"a {kind} without a declared key ({element_id}) is inside a fragment")
+
+
+def _timed_run(at, fragment_id=None):
+    _fragment['id'] = fragment_id
+    try:
+        start = time.perf_counter()
+        at.run()
+        elapsed = time.perf_counter() - start
+    finally:
+        _fragment['id'] = None
+    assert not at.exception, [e.value for e in at.exception]
+    return elapsed * 1000
+
+
+def run(script, repeat):
+    at = AppTest.from_file(str(Path(script).resolve()), default_timeout=300)
+    results = {'first_load': {'full': _timed_run(at), 'fragment': None}}
+    if SECTION_WIDGETS:
+        check_wiring()
+
+    interactions = {**GLOBAL_INTERACTIONS, **SECTION_INTERACTIONS}
+    for name, interact in interactions.items():
+        fragment_id = _fragment_of(name) if name in SECTION_INTERACTIONS else ''
+        if fragment_id is None:
+            continue  # widget tidak tampil di halaman ini
+        full, fragment = [], []
+        for i in range(repeat):
+            interact(at, i)
+            full.append(_timed_run(at))
+            if fragment_id:
+                interact(at, i + repeat)
+                fragment.append(_timed_run(at, fragment_id))
+                # Rerun fragment hanya mengembalikan elemen fragment itu; pohon elemen dipulihkan sebelum interaksi berikutnya
+                at.run()
+        results[name] = {'full': statistics.median(full),
+                         'fragment': statistics.median(fragment) if fragment else None}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--script", default="dashboard.py")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    results = run(args.script, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'interaction':>18} {'full ms':>9} {'fragment ms':>12}")
+        for name, result in results.items():
+            fragment = f"{result['fragment']:12.1f}" if result['fragment'] is not None else f"{'-':>12}"
+            print(f"{name:>18} {result['full']:9.1f} {fragment}")
@@ -0,0 +1,175 @@
+"""Per-stage timings and peak memory of the dashboard's data path, without a browser.
+
+Run from the repository root:
+
+    python -m benchmarks.pipeline_bench [--scales 1 10 100] [--output report.json]
+
+Stages mirror what one dashboard rerun does with cold caches: load the
+columnar file, build the hierarchy index and aggregate cube (what
+get_hierarchy_index() and get_aggregate_cube() build when no artifact is
+stored), then for every province x date window filter, look up extrema
+and weekday means, and build the per-region charts through
+charts.region_charts exactly as the dashboard and precompute.py do; per
+year found in the data, fit the clustering model. Scaled runs stack
+synthetic copies of the bundled data (see benchmarks.synthetic) and sweep
+the original provinces, so every lookup searches the full-size index.
+Everything is local; no network is used.
+"""
+import argparse
+import json
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+from aggregates import AggregateCube
+from benchmarks.synthetic import scale_frame
+from charts import region_charts
+from clustering import ENGINES, feature_matrix, fit_model, fit_streaming_model, iter_chunks
+from data_loader import feather, read_columnar, sync_columnar_store
+from downsample import DEFAULT_POINT_BUDGET
+from figures import GROCERY, RESIDENTIAL, RETAIL, WORKPLACES, cluster_figure
+from region_index import HierarchyIndex
+
+
+def windows_for(min_date, max_date):
+    return {
+        'full': (min_date, max_date),
+        'last_90d': (max_date - pd.Timedelta(days=89), max_date),
+        'lockdown_2020': (pd.Timestamp('2020-03-15'), pd.Timestamp('2020-06-30')),
+        'year_2021': (pd.Timestamp('2021-01-01'), pd.Timestamp('2021-12-31')),
+    }
+
+
+class Recorder:
+    """Collects timings per (scale, stage) and peak allocations.
+
+    The first call of a stage runs once under tracemalloc for its peak
+    memory and once more untraced for the timing, so tracing overhead and
+    one-off imports never show up in the timings.
+    """
+
+    def __init__(self):
+        self.samples = {}
+        self.peaks = {}
+        self.rows = {}
+
+    def measure(self, scale, stage, func, rows=None):
+        key = (scale, stage)
+        if key not in self.peaks:
+            tracemalloc.start()
+            func()
+            self.peaks[key] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        start = time.perf_counter()
+        result = func()
+        self.samples.setdefault(key, []).append(time.perf_counter() - start)
+        if rows is not None:
+            self.rows.setdefault(key, []).append(rows(result) if callable(rows) else rows)
+        return result
+
+    def report(self):
+        records = []
+        for (scale, stage), samples in self.samples.items():
+            ms = sorted(s * 1000 for s in samples)
+            records.append({
+                'scale': scale,
+                'stage': stage,
+                'calls': len(ms),
+                'median_ms': statistics.median(ms),
+                'p95_ms': ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+                'max_ms': ms[-1],
+                'peak_alloc_mb': self.peaks[(scale, stage)] / 1e6,
+                'rows': statistics.median(self.rows[(scale, stage)]) if (scale, stage) in self.rows else None,
+            })
+        return records
+
+
+def run_scale(recorder, base, scale, engines, skip_clustering, max_regions=None):
+    frame = scale_frame(base, scale)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "mobility.feather"
+        feather.write_feather(frame, path, compression='uncompressed')
+        df = recorder.measure(scale, 'load', lambda: read_columnar(path), rows=len)
+    del frame
+
+    index = recorder.measure(scale, 'index_build', lambda: HierarchyIndex(df), rows=len(df))
+    cube = recorder.measure(scale, 'aggregate_build', lambda: AggregateCube(index), rows=len(df))
+
+    # Kunci wilayah HierarchyIndex berupa path; provinsi asli = (nama,)
+    regions = [(name,) for name in base['sub_region_1'].dropna().unique()][:max_regions]
+    windows = windows_for(df['date'].min(), df['date'].max())
+    for region in regions:
+        for start, end in windows.values():
+            filtered = recorder.measure(scale, 'filter', lambda: index.query(region, start, end), rows=len)
+            if filtered.empty:
+                continue
+            recorder.measure(scale, 'extrema', lambda: {
+                metric: cube.extrema(region, start, end, metric) for metric in (RETAIL, GROCERY, WORKPLACES)
+            })
+            recorder.measure(scale, 'weekday_mean', lambda: cube.weekday_mean(region, start, end, RESIDENTIAL))
+            charts = region_charts(index, cube, f"bench-{scale}", region, start.date(), end.date(),
+                                   DEFAULT_POINT_BUDGET)
+            recorder.measure(scale, 'charts', lambda: [build() for _, build in charts.values()],
+                             rows=len(filtered))
+
+    if skip_clustering:
+        return
+    for year in sorted(int(year) for year in df['year'].unique()):
+        rows, X = recorder.measure(scale, 'cluster_prepare', lambda: feature_matrix(df, year), rows=lambda r: len(r[0]))
+        if len(rows) == 0:
+            continue
+        for engine in engines:
+            if engine == 'minibatch':
+                model = recorder.measure(scale, 'cluster_fit_minibatch',
+                                         lambda: fit_streaming_model(lambda: iter_chunks(X), year), rows=len(X))
+            else:
+                model = recorder.measure(scale, 'cluster_fit_exact', lambda: fit_model(X, year), rows=len(X))
+        if scale == 1:
+            recorder.measure(scale, 'cluster_figure',
+                             lambda: cluster_figure(rows.assign(cluster=model.labels)), rows=len(rows))
+
+
+def main(scales, engines, skip_clustering, max_regions, output):
+    base = read_columnar(sync_columnar_store())
+
+    recorder = Recorder()
+    for scale in scales:
+        started = time.perf_counter()
+        run_scale(recorder, base, scale, engines, skip_clustering, max_regions)
+        print(f"scale {scale}x done in {time.perf_counter() - started:.1f} s")
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'scales': scales,
+            'max_regions': max_regions,
+            'base_rows': len(base),
+        },
+        'results': recorder.report(),
+    }
+    if output:
+        Path(output).write_text(json.dumps(report, indent=2, default=str))
+        print(f"report written to {output}")
+
+    print(f"\n{'scale':>5} {'stage':<22} {'calls':>6} {'median ms':>10} {'p95 ms':>9} {'peak MB':>8}")
+    for record in report['results']:
+        print(f"{record['scale']:>4}x {record['stage']:<22} {record['calls']:>6} {record['median_ms']:>10.3f} "
+              f"{record['p95_ms']:>9.3f} {record['peak_alloc_mb']:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--skip-clustering", action="store_true")
+    parser.add_argument("--max-regions", type=int, help="sweep only the first N provinces")
+    parser.add_argument("--output", help="write the JSON report to this path")
+    args = parser.parse_args()
+    main(args.scales, args.engines, args.skip_clustering, args.max_regions, args.output)
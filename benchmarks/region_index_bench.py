@@ -0,0 +1,75 @@
+"""Compare HierarchyIndex lookups with the dashboard's original boolean masks.
+
+Run from the repository root:
+
+    python -m benchmarks.region_index_bench [--factors 1 10 100]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import scale_frame
+from data_loader import load_mobility_data
+from region_index import HierarchyIndex
+
+
+def mask_query(df, region, start_date, end_date):
+    return df[(df['date'] >= pd.to_datetime(start_date)) &
+              (df['date'] <= pd.to_datetime(end_date)) &
+              (df['sub_region_1'] == region)]
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(factors, queries, repeat):
+    base = load_mobility_data()
+    rng = np.random.default_rng(42)
+    min_date, max_date = base['date'].min(), base['date'].max()
+    days = (max_date - min_date).days
+
+    print(f"{'scale':>6} {'rows':>11} {'build ms':>9} {'mask ms':>9} {'object ms':>10} {'index ms':>9} {'vs object':>10}")
+    for factor in factors:
+        df = scale_frame(base, factor)
+        # Salinan dengan kolom region bertipe string, seperti keluaran read_csv
+        raw = df.assign(sub_region_1=df['sub_region_1'].astype(object))
+
+        start = time.perf_counter()
+        index = HierarchyIndex(df)
+        build = time.perf_counter() - start
+
+        cases = []
+        for _ in range(queries):
+            region = index.regions[rng.integers(len(index.regions))]
+            offset = int(rng.integers(days))
+            length = int(rng.integers(1, days - offset + 1))
+            start_date = min_date + pd.Timedelta(days=offset)
+            cases.append((region, start_date, start_date + pd.Timedelta(days=length)))
+
+        for case in cases:
+            expected = mask_query(df, *case)
+            got = index.query((case[0],), *case[1:])
+            pd.testing.assert_frame_equal(got.sort_index(), expected.sort_index())
+
+        mask = sum(best_of(lambda: mask_query(df, *case), repeat) for case in cases) / len(cases)
+        obj = sum(best_of(lambda: mask_query(raw, *case), repeat) for case in cases) / len(cases)
+        indexed = sum(best_of(lambda: index.query((case[0],), *case[1:]), repeat) for case in cases) / len(cases)
+        print(f"{factor:>5}x {len(df):>11,} {build * 1000:>9.1f} {mask * 1000:>9.3f} "
+              f"{obj * 1000:>10.3f} {indexed * 1000:>9.3f} {obj / indexed:>9.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.factors, args.queries, args.repeat)
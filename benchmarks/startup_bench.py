@@ -0,0 +1,101 @@
+"""Cold start of the dashboard script: import time and time to first paint.
+
+Run from the repository root:
+
+    python -m benchmarks.startup_bench [--repeat 3] [--script dashboard.py]
+
+Every repeat is a fresh Python process (like the first session after the
+server starts) that already has streamlit imported, then runs the script
+once with streamlit.testing's AppTest. Reported per run:
+
+- imports: time spent importing modules while the script ran
+  (from -X importtime, top-level imports only, streamlit's own excluded);
+- first paint: script start until the first element is sent to the
+  browser; first chart: until the first chart is sent;
+- full run: the whole first run;
+- which heavy optional modules were loaded by the end of the run.
+
+Uses whatever is in cache/ (columnar store, artifacts, cluster models), so
+run it once beforehand to measure a warm disk cache.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+HEAVY_MODULES = ('sklearn', 'plotly.express', 'geopandas', 'scipy')
+
+CHILD = r"""
+import json, sys, time
+from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+from streamlit.testing.v1 import AppTest
+
+events = []
+original = ScriptRunContext.enqueue
+def enqueue(self, msg):
+    if msg.HasField('delta') and msg.delta.HasField('new_element'):
+        events.append((time.perf_counter(), msg.delta.new_element.WhichOneof('type')))
+    return original(self, msg)
+ScriptRunContext.enqueue = enqueue
+
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+sys.stderr.write("@@run\n"); sys.stderr.flush()
+start = time.perf_counter()
+at.run()
+end = time.perf_counter()
+sys.stderr.write("@@done\n"); sys.stderr.flush()
+charts = [t for t, kind in events if kind == 'plotly_chart']
+print(json.dumps({
+    'first_paint': events[0][0] - start if events else None,
+    'first_chart': charts[0] - start if charts else None,
+    'full_run': end - start,
+    'exceptions': len(at.exception),
+    'heavy': [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def import_seconds(stderr):
+    """Sum of top-level cumulative import times logged while the script ran."""
+    total, running = 0, False
+    for line in stderr.splitlines():
+        if line.startswith("@@"):
+            running = line == "@@run"
+            continue
+        if running and line.startswith("import time:"):
+            _, cumulative, name = line.split("|")
+            # Hanya impor tingkat atas (nama tanpa indentasi tambahan)
+            if not name.startswith("  ") and not name.strip().startswith("streamlit"):
+                total += int(cumulative)
+    return total / 1e6
+
+
+def run_once(script):
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD, str(script)],
+                             capture_output=True, text=True, cwd=Path(script).resolve().parent)
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr[-2000:])
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result['imports'] = import_seconds(process.stderr)
+    return result
+
+
+def run(script, repeat):
+    runs = [run_once(script) for _ in range(repeat)]
+    print(f"{script}: {repeat} cold runs, median (ms)")
+    for name in ('imports', 'first_paint', 'first_chart', 'full_run'):
+        values = [r[name] for r in runs if r[name] is not None]
+        print(f"{name:>12} {statistics.median(values) * 1000:9.1f}" if values else f"{name:>12}       n/a")
+    print(f"{'heavy':>12} {', '.join(runs[-1]['heavy']) or '-'}")
+    if any(r['exceptions'] for r in runs):
+        print("warning: the script raised exceptions")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--script", default="dashboard.py")
+    args = parser.parse_args()
+    run(args.script, args.repeat)
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from data_loader import REGION_COLUMNS
+
+
+def scale_frame(df, factor):
+    """Stack `factor` copies of the mobility frame as if they were other countries.
+
+    Copy 0 is the original data; copy i gets every region/place name
+    suffixed with " #i", so region lookups stay as selective as they would
+    be in a multi-country report. Categorical columns are rebuilt from
+    codes, which keeps 100x frames cheap to create.
+    """
+    if factor == 1:
+        return df
+    parts = {column: np.tile(df[column].to_numpy(), factor) for column in df.columns
+             if column not in REGION_COLUMNS}
+    scaled = pd.DataFrame(parts)
+    for column in df.columns:
+        if column not in REGION_COLUMNS:
+            scaled[column] = scaled[column].astype(df[column].dtype)
+            continue
+        values = df[column].astype('category')
+        categories = list(values.cat.categories)
+        codes = values.cat.codes.to_numpy().astype(np.int64)
+        stacked = np.concatenate([
+            np.where(codes >= 0, codes + i * len(categories), -1) for i in range(factor)
+        ])
+        renamed = categories + [f"{c} #{i}" for i in range(1, factor) for c in categories]
+        scaled[column] = pd.Categorical.from_codes(stacked, categories=renamed)
+    return scaled[list(df.columns)]
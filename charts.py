@@ -0,0 +1,47 @@
+"""Cache keys and builders of the per-region mobility charts.
+
+dashboard.py looks these charts up by key and precompute.py serializes
+the same charts ahead of time, so both take keys and builders from here.
+"""
+from figures import (GROCERY, RESIDENTIAL, RETAIL, WORKPLACES, residential_weekday_figure, retail_grocery_figure,
+                     workplace_change_figure, workplace_figure)
+from timeseries import overlay_frame
+
+
+def region_charts(index, cube, version, region, start_date, end_date, point_budget, overlays=(), rows=None):
+    """{chart: (key, build)} for one region and date range.
+
+    Keys hold only what each chart depends on (language never changes a
+    chart; the weekday bars ignore the point budget and overlays). `rows`
+    replaces index.query, e.g. to profile the filter.
+    """
+    rows = rows or index.query
+    key = (version, region, start_date, end_date, point_budget)
+    return {
+        'retail_grocery': (key + (overlays,), lambda: retail_grocery_figure(
+            rows(region, start_date, end_date),
+            cube.extrema(region, start_date, end_date, RETAIL),
+            cube.extrema(region, start_date, end_date, GROCERY),
+            point_budget,
+            overlay_frame(region, start_date, end_date, [RETAIL, GROCERY], overlays)
+        )),
+        'workplace': (key + (overlays,), lambda: workplace_figure(
+            rows(region, start_date, end_date),
+            cube.extrema(region, start_date, end_date, WORKPLACES),
+            point_budget,
+            overlay_frame(region, start_date, end_date, [WORKPLACES], overlays)
+        )),
+        'workplace_increase': (key, lambda: workplace_change_figure(
+            index.increases(region, start_date, end_date, WORKPLACES),
+            "Workplace Mobility Increase Only",
+            point_budget
+        )),
+        'workplace_decrease': (key, lambda: workplace_change_figure(
+            index.decreases(region, start_date, end_date, WORKPLACES),
+            "Workplace Mobility Decrease Only",
+            point_budget
+        )),
+        'residential_weekday': (key[:4], lambda: residential_weekday_figure(
+            cube.weekday_mean(region, start_date, end_date, RESIDENTIAL)
+        )),
+    }
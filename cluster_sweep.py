@@ -0,0 +1,367 @@
+"""Parallel k sweep of the mobility clustering, per year and per region.
+
+For every year the complete feature rows are standardised (as in
+clustering.fit_model) and written once into a shared-memory block, sorted
+by (year, region), so every (year, region) scope is a contiguous slice. A
+process pool sized to the usable cores attaches to the block once per
+worker (sweep_worker.py); each task fits KMeans for every k of one scope
+straight from its slice, without pickling or copying the matrix.
+
+The pool does not live in the dashboard process: spawn re-runs __main__ in
+every worker, and under Streamlit __main__ is the dashboard script. A
+SweepJob instead starts `python -m cluster_sweep`, whose __main__ is this
+module, and follows its progress from a background thread; cancelling
+sets a byte in the shared block that workers check between k values.
+Finished sweeps are stored under cache/sweeps/ and reused until the data
+or the sweep settings change.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from clustering import FEATURES, RANDOM_STATE
+from data_loader import BASE_DIR, CACHE_DIR, dataset_version, load_mobility_data
+from sweep_worker import SILHOUETTE_SAMPLE, attach, block_size, fit_scope, shared_views
+
+SWEEP_DIR = CACHE_DIR / "sweeps"
+K_VALUES = tuple(range(2, 11))
+ALL_REGIONS = "All regions"
+# Naikkan bila isi hasil sapuan berubah, agar hasil lama di cache/sweeps/ tidak dipakai
+SWEEP_FORMAT = 2
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def worker_count():
+    """Cores this process may run on (respects CPU affinity / container limits)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+def sweep_key(years, k_values, features=FEATURES):
+    """Name of the cached sweep for the current dataset and these settings."""
+    settings = repr((tuple(years), tuple(k_values), tuple(features), SILHOUETTE_SAMPLE, RANDOM_STATE, SWEEP_FORMAT))
+    return f"{dataset_version()}-{hashlib.sha1(settings.encode()).hexdigest()[:8]}"
+
+
+def _layout(df, years, features):
+    """Standardised rows of every year, sorted by region, with the scopes that slice them."""
+    blocks, scopes, regions, scaling = [], [], [], {}
+    offset = 0
+    for year in years:
+        rows = df[df['year'] == year].dropna(subset=list(features))
+        if rows.empty:
+            continue
+        # Urut per provinsi (stabil), baris tingkat negara (kode -1) di depan
+        codes = rows['sub_region_1'].cat.codes.to_numpy()
+        order = np.argsort(codes, kind='stable')
+        X = rows[list(features)].to_numpy(dtype='float64')[order]
+        mean, scale = X.mean(axis=0), X.std(axis=0)
+        scale[scale == 0] = 1.0  # sama seperti StandardScaler
+        blocks.append((X - mean) / scale)
+        scaling[year] = (mean, scale)
+
+        labels = rows['sub_region_1'].to_numpy()[order]
+        regions.append(labels)
+        scopes.append((year, ALL_REGIONS, offset, offset + len(X)))
+        sorted_codes = codes[order]
+        boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+        for lo, hi in zip(np.concatenate(([0], boundaries)), np.concatenate((boundaries, [len(X)]))):
+            if sorted_codes[lo] >= 0:
+                scopes.append((year, labels[lo], offset + lo, offset + hi))
+        offset += len(X)
+    return np.concatenate(blocks), scopes, np.concatenate(regions), scaling
+
+
+def run_sweep(years, k_values, features=FEATURES, workers=None, cancel=None, report=None):
+    """Fit every scope on a process pool; returns the sweep result, or None if cancelled.
+
+    Runs in the `python -m cluster_sweep` process (see SweepJob). `cancel`
+    is a threading.Event; `report(done, total)` is called as scopes finish.
+    """
+    from multiprocessing import shared_memory
+
+    cancel = cancel or threading.Event()
+    matrix, scopes, regions, scaling = _layout(load_mobility_data(), years, features)
+    if report:
+        report(0, len(scopes))
+    block = shared_memory.SharedMemory(create=True, size=block_size(matrix.shape))
+    shared = flag = None
+    try:
+        shared, flag = shared_views(block.buf, matrix.shape)
+        shared[:] = matrix
+        flag[0] = 0
+        scores, models = _fit(block.name, matrix.shape, flag, scopes, regions, scaling, k_values,
+                              workers or worker_count(), cancel, report)
+    finally:
+        # View numpy dilepas dulu; close() gagal selama buffer masih dirujuk
+        shared = flag = None
+        block.close()
+        block.unlink()
+    if cancel.is_set():
+        return None
+
+    years = [int(year) for year in years]
+    # Transisi dihitung di sini (scipy hanya diimpor di proses sapuan), dashboard tinggal membaca
+    transitions = {}
+    for k in k_values:
+        for year_from, year_to in zip(years, years[1:]):
+            counts = _transition_counts(models, k, year_from, year_to)
+            if counts is not None:
+                transitions[f"{k}|{year_from}|{year_to}"] = counts.tolist()
+    return {'scores': scores, 'models': models, 'transitions': transitions,
+            'years': years, 'k_values': list(k_values)}
+
+
+def _fit(name, shape, flag, scopes, regions, scaling, k_values, workers, cancel, report):
+    scores, models = [], {}
+    # spawn: worker mulai bersih, tanpa state OpenMP/thread dari proses ini
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=attach, initargs=(name, shape)) as pool:
+        futures = {
+            pool.submit(fit_scope, lo, hi, k_values, scope == ALL_REGIONS): (year, scope, lo, hi)
+            for year, scope, lo, hi in scopes
+        }
+        pending = set(futures)
+        while pending and not cancel.is_set():
+            finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in finished:
+                year, scope, lo, hi = futures[future]
+                for score in future.result():
+                    labels = score.pop('labels', None)
+                    centroids = score.pop('centroids', None)
+                    scores.append({'year': int(year), 'scope': str(scope), **score})
+                    if labels is not None:
+                        models[f"{year}|{score['k']}"] = _summarize_model(labels, centroids, regions[lo:hi],
+                                                                         scaling[year])
+            if report:
+                report(len(futures) - len(pending), len(futures))
+        if cancel.is_set():
+            # Tugas yang sedang berjalan berhenti sebelum k berikutnya; sisanya tidak dijalankan
+            flag[0] = 1
+            pool.shutdown(wait=True, cancel_futures=True)
+    return scores, models
+
+
+class SweepJob:
+    """One sweep run by a `python -m cluster_sweep` process; poll `progress`, call `cancel()`."""
+
+    def __init__(self, key, years, k_values, features=FEATURES, workers=None):
+        self.key = key
+        self.years = tuple(years)
+        self.k_values = tuple(k_values)
+        self.features = tuple(features)
+        self.workers = workers or worker_count()
+        self.status = 'running'
+        self.error = None
+        self.result = None
+        self.done = 0
+        self.total = 0
+        self._cancel = threading.Event()
+        self._process = None
+        self._process_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"sweep-{key}", daemon=True)
+        self._thread.start()
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 0.0
+
+    def cancel(self):
+        with self._process_lock:
+            self._cancel.set()
+            self._send_cancel()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+        return self.status
+
+    def _send_cancel(self):
+        if self._process is None or self._process.poll() is not None:
+            return
+        try:
+            self._process.stdin.write("cancel\n")
+            self._process.stdin.flush()
+        except OSError:
+            pass  # proses sudah selesai
+
+    def _run(self):
+        settings = {'years': [int(year) for year in self.years], 'k_values': list(self.k_values),
+                    'features': list(self.features), 'workers': self.workers}
+        message = {}
+        try:
+            with self._process_lock:
+                self._process = subprocess.Popen(
+                    [sys.executable, "-m", "cluster_sweep", json.dumps(settings)],
+                    cwd=BASE_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+                )
+                if self._cancel.is_set():
+                    self._send_cancel()
+            # Satu objek JSON per baris: progres, lalu hasil atau galat
+            for line in self._process.stdout:
+                message = json.loads(line)
+                if 'done' in message:
+                    self.done, self.total = message['done'], message['total']
+            self._process.wait()
+            if self._cancel.is_set():
+                self.status = 'cancelled'
+                return
+            if message.get('result') is None:
+                self.status = 'failed'
+                self.error = message.get('error') or f"sweep process exited with code {self._process.returncode}"
+                return
+            self.result = message['result']
+            save_sweep(self.key, self.result)
+        except Exception as exc:  # ditampilkan di UI, bukan mematikan thread diam-diam
+            self.status, self.error = 'failed', repr(exc)
+            return
+        self.status = 'done'
+
+
+def _summarize_model(labels, centroids, regions, scaling):
+    """Centroids in raw feature units and each region's most common cluster."""
+    mean, scale = scaling
+    frame = pd.DataFrame({'region': regions, 'cluster': labels}).dropna()
+    dominant = frame.groupby('region', observed=True)['cluster'].agg(lambda c: int(c.mode().iloc[0]))
+    return {'centroids': (centroids * scale + mean).tolist(), 'dominant': {str(r): int(c) for r, c in dominant.items()}}
+
+
+def save_sweep(key, result):
+    SWEEP_DIR.mkdir(parents=True, exist_ok=True)
+    path = SWEEP_DIR / f"sweep-{key}.json"
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(result))
+    os.replace(tmp_path, path)
+    # Sapuan untuk versi data lama tidak berguna lagi
+    version = key.split('-')[0]
+    for stale in SWEEP_DIR.glob("sweep-*.json"):
+        if not stale.name.startswith(f"sweep-{version}-"):
+            stale.unlink(missing_ok=True)
+
+
+_loaded = {}
+
+
+def load_sweep(key):
+    """Stored result of a finished sweep, or None (misses are not remembered)."""
+    if key not in _loaded:
+        path = SWEEP_DIR / f"sweep-{key}.json"
+        if not path.exists():
+            return None
+        _loaded[key] = json.loads(path.read_text())
+    return _loaded[key]
+
+
+def start_sweep(years, k_values, features=FEATURES):
+    """Running (or just finished) SweepJob for these settings, shared by every session."""
+    key = sweep_key(years, k_values, features)
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is None or job.status in ('cancelled', 'failed'):
+            job = _jobs[key] = SweepJob(key, years, k_values, features)
+        return job
+
+
+def running_sweep(years, k_values, features=FEATURES):
+    return _jobs.get(sweep_key(years, k_values, features))
+
+
+def score_frame(result, scope=ALL_REGIONS):
+    """Inertia and silhouette per (year, k) for one scope."""
+    frame = pd.DataFrame(result['scores'])
+    return frame[frame['scope'] == scope].sort_values(['year', 'k']).reset_index(drop=True)
+
+
+def recommend_k(scores):
+    """{year: (elbow k, best-silhouette k)} from a score_frame.
+
+    The elbow is the k whose (k, inertia) point lies farthest below the
+    straight line from the first to the last k.
+    """
+    recommended = {}
+    for year, group in scores.groupby('year'):
+        k = group['k'].to_numpy(dtype='float64')
+        inertia = group['inertia'].to_numpy()
+        if len(k) < 3:
+            elbow = int(k[0])
+        else:
+            # Normalisasi kedua sumbu agar jarak tidak didominasi skala inertia
+            x = (k - k[0]) / (k[-1] - k[0])
+            y = (inertia - inertia[-1]) / (inertia[0] - inertia[-1] or 1.0)
+            elbow = int(k[np.argmax((1 - x) - y)])
+        best = group.loc[group['silhouette'].idxmax(), 'k'] if group['silhouette'].notna().any() else elbow
+        recommended[int(year)] = (elbow, int(best))
+    return recommended
+
+
+def _transition_counts(models, k, year_from, year_to):
+    """k x k counts of regions by (cluster in `year_from`, matched cluster in `year_to`).
+
+    Cluster numbers are arbitrary per fit, so the clusters of `year_to` are
+    first matched to the nearest clusters of `year_from` (by centroid, in
+    raw feature units) before counting.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    source = models.get(f"{year_from}|{k}")
+    target = models.get(f"{year_to}|{k}")
+    if source is None or target is None:
+        return None
+    distances = ((np.array(target['centroids'])[:, None, :] - np.array(source['centroids'])[None, :, :]) ** 2).sum(axis=2)
+    rows, columns = linear_sum_assignment(distances)
+    mapping = dict(zip(rows, columns))
+
+    counts = np.zeros((k, k), dtype=np.int64)
+    for region, cluster in source['dominant'].items():
+        if region in target['dominant']:
+            counts[cluster, mapping[target['dominant'][region]]] += 1
+    return counts
+
+
+def transition_matrix(result, k, year_from, year_to):
+    """Regions moving from each cluster of `year_from` to each cluster of `year_to`, or None."""
+    counts = result.get('transitions', {}).get(f"{k}|{year_from}|{year_to}")
+    if counts is None:
+        return None
+    labels = [f"Cluster {i}" for i in range(k)]
+    return pd.DataFrame(counts, index=pd.Index(labels, name=str(year_from)), columns=pd.Index(labels, name=str(year_to)))
+
+
+def main():
+    """`python -m cluster_sweep '<settings json>'`: the process a SweepJob starts.
+
+    Progress and the result go to stdout as JSON lines; any line on stdin
+    (or stdin closing, e.g. when the dashboard exits) cancels the sweep.
+    """
+    # Protokol memakai salinan stdout; fd 1 diarahkan ke stderr agar cetakan lain (juga dari worker) tidak ikut
+    protocol = os.fdopen(os.dup(1), 'w')
+    os.dup2(2, 1)
+
+    def send(message):
+        protocol.write(json.dumps(message) + "\n")
+        protocol.flush()
+
+    settings = json.loads(sys.argv[1])
+    cancel = threading.Event()
+    threading.Thread(target=lambda: (sys.stdin.readline(), cancel.set()), daemon=True).start()
+    try:
+        result = run_sweep(settings['years'], settings['k_values'], tuple(settings['features']),
+                           settings['workers'], cancel, lambda done, total: send({'done': done, 'total': total}))
+    except Exception as exc:
+        send({'error': repr(exc)})
+        sys.exit(1)
+    send({'result': result})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+import hashlib
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CACHE_DIR, METRICS, dataset_signature, feather, load_mobility_data, sync_columnar_store
+
+FEATURES = tuple(METRICS)
+N_CLUSTERS = 3
+RANDOM_STATE = 42
+MODEL_DIR = CACHE_DIR / "clusters"
+
+# 'exact' = StandardScaler + KMeans pada seluruh matriks,
+# 'minibatch' = scaler inkremental + MiniBatchKMeans per potongan data
+ENGINES = ('exact', 'minibatch')
+DEFAULT_ENGINE = os.environ.get('CLUSTER_ENGINE', 'exact')
+CHUNK_SIZE = 4096
+STREAMING_EPOCHS = 3
+INIT_SAMPLE_SIZE = 2048
+# k-means++ diulang beberapa kali pada sampel (murah), yang inersianya terkecil dipakai
+INIT_RUNS = 10
+# Dinaikkan setiap kali cara fit berubah, supaya model lama di disk tidak dipakai lagi
+MODEL_FORMAT = 3
+
+
+@dataclass
+class ClusterModel:
+    """Fitted StandardScaler + KMeans state, stored as plain arrays."""
+    year: int
+    features: tuple
+    n_clusters: int
+    data_hash: str
+    scaler_mean: np.ndarray
+    scaler_scale: np.ndarray
+    centroids: np.ndarray  # dalam ruang yang sudah di-scale
+    labels: np.ndarray
+    inertia: float
+    engine: str = 'exact'
+    warm_started: bool = False
+    # Jumlah fitur mentah dan banyak baris per klaster, dikumpulkan saat fit (tanpa matriks utuh)
+    cluster_sums: np.ndarray = None
+    cluster_counts: np.ndarray = None
+
+    @property
+    def prefix(self):
+        return model_prefix(self.year, self.features, self.n_clusters, self.engine)
+
+    def cluster_stats(self):
+        """Per-cluster feature means, same as groupby('cluster')[features].mean()."""
+        counts = self.cluster_counts
+        stats = pd.DataFrame(self.cluster_sums / np.maximum(counts, 1)[:, None], columns=list(self.features))
+        stats.index.name = 'cluster'
+        return stats[counts > 0]
+
+    def save(self, directory=MODEL_DIR):
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self.prefix}-{self.data_hash}.npz"
+        # Ditulis ke file sementara lalu di-rename, jadi pembaca lain tidak pernah melihat arsip setengah jadi
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as handle:
+            np.savez(
+                handle,
+                year=self.year, features=np.array(self.features), n_clusters=self.n_clusters,
+                data_hash=self.data_hash, scaler_mean=self.scaler_mean, scaler_scale=self.scaler_scale,
+                centroids=self.centroids, labels=self.labels, inertia=self.inertia, engine=self.engine,
+                cluster_sums=self.cluster_sums, cluster_counts=self.cluster_counts
+            )
+        os.replace(tmp_path, path)
+        # Satu file per (tahun, mesin, fitur, k): versi data dan format lama (termasuk yang tanpa -v) dihapus
+        for stale in directory.glob(f"{model_stem(self.year, self.features, self.n_clusters, self.engine)}-*.npz"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+        return path
+
+    @classmethod
+    def read(cls, path):
+        """Model stored at `path`, or None if it is missing or unreadable."""
+        try:
+            return cls.load(path)
+        except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                year=int(data['year']), features=tuple(str(f) for f in data['features']),
+                n_clusters=int(data['n_clusters']), data_hash=str(data['data_hash']),
+                scaler_mean=data['scaler_mean'], scaler_scale=data['scaler_scale'],
+                centroids=data['centroids'], labels=data['labels'], inertia=float(data['inertia']),
+                engine=str(data['engine']), cluster_sums=data['cluster_sums'], cluster_counts=data['cluster_counts']
+            )
+
+
+def model_stem(year, features, n_clusters, engine='exact'):
+    """File name start shared by every format version of one (year, engine, features, k)."""
+    feature_hash = hashlib.sha1(",".join(features).encode()).hexdigest()[:8]
+    return f"{year}-{engine}-k{n_clusters}-{feature_hash}"
+
+
+def model_prefix(year, features, n_clusters, engine='exact'):
+    return f"{model_stem(year, features, n_clusters, engine)}-v{MODEL_FORMAT}"
+
+
+def matrix_hash(X):
+    """Hash of a feature matrix, or of every chunk from a chunk factory."""
+    digest = hashlib.sha1()
+    for chunk in (X() if callable(X) else [X]):
+        digest.update(np.ascontiguousarray(chunk).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def cluster_totals(labels, X, n_clusters):
+    """(per-cluster feature sums, per-cluster row counts) of X; chunk results add up."""
+    counts = np.bincount(labels, minlength=n_clusters)
+    sums = np.stack([np.bincount(labels, weights=X[:, j], minlength=n_clusters)
+                     for j in range(X.shape[1])], axis=1)
+    return sums, counts
+
+
+def iter_chunks(X, chunk_size=CHUNK_SIZE):
+    for start in range(0, len(X), chunk_size):
+        yield X[start:start + chunk_size]
+
+
+def iter_columnar_chunks(year, features=FEATURES, chunk_size=CHUNK_SIZE, paths=None):
+    """Complete feature rows of `year`, read batch by batch from the Feather parts.
+
+    The parts are memory-mapped, so only one batch is materialised at a
+    time; this is the out-of-core source for reports too big to load whole.
+    """
+    if feather is None:
+        raise RuntimeError("pyarrow is required to stream from the columnar cache")
+    import pyarrow.compute as pc
+
+    for path in paths or sync_columnar_store():
+        table = feather.read_table(path, columns=['year', *features], memory_map=True)
+        for batch in table.to_batches(max_chunksize=chunk_size):
+            batch = batch.filter(pc.equal(batch.column('year'), year)).drop_null()
+            if batch.num_rows:
+                yield np.column_stack([
+                    batch.column(feature).to_numpy(zero_copy_only=False) for feature in features
+                ]).astype('float64')
+
+
+def feature_matrix(df, year, features=FEATURES):
+    """Rows of `year` with complete features, and their float64 matrix."""
+    rows = df[df['year'] == year].dropna(subset=list(features))
+    X = rows[list(features)].to_numpy(dtype='float64')
+    return rows, X
+
+
+def fit_model(X, year, features=FEATURES, n_clusters=N_CLUSTERS, data_hash='', previous=None):
+    """Fit scaler + KMeans exactly like the original dashboard code.
+
+    With `previous` (a model of the same year/features/k fitted on older
+    data) KMeans starts from its centroids, mapped into the new scaler's
+    space, and runs a single initialisation instead of k-means++.
+    """
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    if previous is not None:
+        raw_centroids = previous.centroids * previous.scaler_scale + previous.scaler_mean
+        init = (raw_centroids - scaler.mean_) / scaler.scale_
+        kmeans = KMeans(n_clusters=n_clusters, init=init, n_init=1, random_state=RANDOM_STATE)
+    else:
+        kmeans = KMeans(n_clusters=n_clusters, random_state=RANDOM_STATE)
+    labels = kmeans.fit_predict(X_scaled)
+    sums, counts = cluster_totals(labels, X, n_clusters)
+
+    return ClusterModel(
+        year=year, features=tuple(features), n_clusters=n_clusters, data_hash=data_hash,
+        scaler_mean=scaler.mean_, scaler_scale=scaler.scale_, centroids=kmeans.cluster_centers_,
+        labels=labels, inertia=float(kmeans.inertia_), warm_started=previous is not None,
+        cluster_sums=sums, cluster_counts=counts
+    )
+
+
+def fit_streaming_model(chunks, year, features=FEATURES, n_clusters=N_CLUSTERS, data_hash='',
+                        previous=None, epochs=STREAMING_EPOCHS):
+    """Bounded-memory alternative to fit_model.
+
+    `chunks` is a callable returning a fresh iterator of float64 chunks; it
+    is consumed once to fit the scaler incrementally and draw a fixed-size
+    uniform sample, `epochs` times for MiniBatchKMeans.partial_fit, and once
+    more to assign labels and sum the inertia and the per-cluster feature
+    totals behind cluster_stats(). The initial centroids are the
+    best of INIT_RUNS k-means++ runs on the sample. Peak memory is one chunk
+    plus the sample, not the whole year.
+    """
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    from sklearn.preprocessing import StandardScaler
+
+    # Pass pertama: scaler inkremental + sampel acak berukuran tetap untuk inisialisasi.
+    # Baris terurut per region/tanggal, jadi potongan pertama saja tidak representatif.
+    rng = np.random.default_rng(RANDOM_STATE)
+    scaler = StandardScaler()
+    sample = np.empty((0, len(features)))
+    sample_keys = np.empty(0)
+    for chunk in chunks():
+        scaler.partial_fit(chunk)
+        sample = np.concatenate([sample, chunk])
+        sample_keys = np.concatenate([sample_keys, rng.random(len(chunk))])
+        if len(sample) > INIT_SAMPLE_SIZE:
+            keep = np.argpartition(sample_keys, INIT_SAMPLE_SIZE)[:INIT_SAMPLE_SIZE]
+            sample, sample_keys = sample[keep], sample_keys[keep]
+
+    if previous is not None:
+        raw_centroids = previous.centroids * previous.scaler_scale + previous.scaler_mean
+        init = (raw_centroids - scaler.mean_) / scaler.scale_
+    else:
+        # Diurutkan menurut kunci acak: sampel yang sama apa pun batas potongannya
+        sample = sample[np.argsort(sample_keys)]
+        init = KMeans(n_clusters=n_clusters, n_init=INIT_RUNS,
+                      random_state=RANDOM_STATE).fit(scaler.transform(sample)).cluster_centers_
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, init=init, n_init=1, random_state=RANDOM_STATE)
+    for _ in range(epochs):
+        for chunk in chunks():
+            kmeans.partial_fit(scaler.transform(chunk))
+
+    centroids = kmeans.cluster_centers_
+    labels = []
+    inertia = 0.0
+    sums, counts = np.zeros((n_clusters, len(features))), np.zeros(n_clusters, dtype=np.int64)
+    for chunk in chunks():
+        distances = ((scaler.transform(chunk)[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        chunk_labels = distances.argmin(axis=1)
+        inertia += distances[np.arange(len(chunk_labels)), chunk_labels].sum()
+        labels.append(chunk_labels.astype(np.int32))
+        chunk_sums, chunk_counts = cluster_totals(chunk_labels, chunk, n_clusters)
+        sums += chunk_sums
+        counts += chunk_counts
+
+    return ClusterModel(
+        year=year, features=tuple(features), n_clusters=n_clusters, data_hash=data_hash,
+        scaler_mean=scaler.mean_, scaler_scale=scaler.scale_, centroids=centroids,
+        labels=np.concatenate(labels), inertia=float(inertia), engine='minibatch',
+        warm_started=previous is not None, cluster_sums=sums, cluster_counts=counts
+    )
+
+
+class ClusterService:
+    """LRU + on-disk cache of fitted cluster models.
+
+    Models are keyed by (year, features, k, hash of the year's feature
+    matrix), so a change to one year's data never invalidates another
+    year. A miss first looks on disk; only then is sklearn imported and
+    a model fitted, warm-started from the previous version when one exists.
+    """
+
+    def __init__(self, directory=MODEL_DIR, max_entries=8):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._models = OrderedDict()
+        # _lock hanya menjaga dict di bawah; load/fit memakai kunci per model agar model lain tidak ikut menunggu
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.fits = 0
+
+    def get(self, X, year, features=FEATURES, n_clusters=N_CLUSTERS, data_hash=None, engine='exact'):
+        """Cached model for X, a feature matrix (or, for 'minibatch', a chunk factory).
+
+        Concurrent requests for the same model wait for one load or fit;
+        requests for other models are served meanwhile.
+        """
+        if data_hash is None:
+            data_hash = matrix_hash(X)
+        key = (year, tuple(features), n_clusters, data_hash, engine)
+        with self._lock:
+            model = self._cached(key)
+            if model is not None:
+                return model
+            key_lock = self._pending.setdefault(key, threading.Lock())
+
+        with key_lock:
+            prefix = model_prefix(year, features, n_clusters, engine)
+            with self._lock:
+                # Thread lain mungkin baru selesai memuat model yang sama
+                model = self._cached(key)
+                if model is not None:
+                    return model
+                self.misses += 1
+                previous = next((m for m in reversed(self._models.values()) if m.prefix == prefix), None)
+            try:
+                model = self._load_or_fit(X, key, prefix, previous)
+                # Masuk ke _models sebelum kunci per model dilepas, jadi pemanggil berikutnya pasti hit
+                with self._lock:
+                    self._models[key] = model
+                    while len(self._models) > self.max_entries:
+                        self._models.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+        return model
+
+    def _cached(self, key):
+        """Model in memory for `key` (counted as a hit), or None; caller holds _lock."""
+        if key not in self._models:
+            return None
+        self._models.move_to_end(key)
+        self.hits += 1
+        return self._models[key]
+
+    def _load_or_fit(self, X, key, prefix, previous):
+        year, features, n_clusters, data_hash, engine = key
+        path = self.directory / f"{prefix}-{data_hash}.npz"
+        model = ClusterModel.read(path) if path.exists() else None
+        if model is not None:
+            return model
+        if previous is None:
+            previous = self._previous(prefix)
+        if engine == 'minibatch':
+            chunks = X if callable(X) else (lambda: iter_chunks(X))
+            model = fit_streaming_model(chunks, year, features, n_clusters, data_hash, previous)
+        else:
+            model = fit_model(X, year, features, n_clusters, data_hash, previous)
+        with self._lock:
+            self.fits += 1
+        model.save(self.directory)
+        return model
+
+    def _previous(self, prefix):
+        """Most recent saved model with the same year/features/k."""
+        saved = sorted(self.directory.glob(f"{prefix}-*.npz"), key=lambda p: p.stat().st_mtime)
+        return ClusterModel.read(saved[-1]) if saved else None
+
+
+service = ClusterService()
+
+
+@lru_cache(maxsize=4)
+def _year_rows(signature, year, features):
+    df = load_mobility_data()
+    return df[df['year'] == year].dropna(subset=list(features))
+
+
+@lru_cache(maxsize=8)
+def _year_source(signature, year, features, engine):
+    """(feature matrix or chunk factory, data hash) that the model of `engine` is fitted on."""
+    if engine == 'minibatch' and feather is not None:
+        # Mesin streaming membaca part Feather per potongan; urutan barisnya sama dengan `rows`.
+        # Hash-nya dihitung per potongan juga, sama dengan hash matriks utuh, tanpa membangun matriks itu.
+        parts = sync_columnar_store(signature)
+        source = lambda: iter_columnar_chunks(year, features, paths=parts)
+    else:
+        source = _year_rows(signature, year, features)[list(features)].to_numpy(dtype='float64')
+    return source, matrix_hash(source)
+
+
+def get_clustering(year, features=FEATURES, n_clusters=N_CLUSTERS, engine=DEFAULT_ENGINE):
+    """(rows with a `cluster` column, cluster stats, model) for one year.
+
+    With the 'minibatch' engine the year is never held as one float64
+    matrix: the data hash, the fit and the cluster stats all stream from
+    the columnar parts. Returns (None, None, None) when the year has no
+    complete rows.
+    """
+    signature = dataset_signature()
+    features = tuple(features)
+    rows = _year_rows(signature, year, features)
+    if len(rows) == 0:
+        return None, None, None
+    source, data_hash = _year_source(signature, year, features, engine)
+    model = service.get(source, year, features, n_clusters, data_hash, engine)
+    return rows.assign(cluster=model.labels), model.cluster_stats(), model
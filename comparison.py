@@ -0,0 +1,144 @@
+import copy
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from artifacts import load_artifact
+from data_loader import METRICS, dataset_signature
+from region_index import get_hierarchy_index, segments
+
+
+def dense_values(index, paths, metrics):
+    """(dates, date x path x metric array) scattered from the blocks of `paths`, NaN where missing."""
+    present = [i for i, path in enumerate(paths) if path in index.blocks]
+    spans = [index.blocks[paths[i]] for i in present]
+    rows = np.concatenate([np.arange(start, stop) for start, stop in spans]) if spans else np.array([], int)
+    path_ids = np.repeat(np.array(present, dtype=np.int64), [stop - start for start, stop in spans])
+    row_dates = index.dates[rows]
+    dates = np.unique(row_dates)
+    date_ids = np.searchsorted(dates, row_dates)
+
+    values = np.full((len(dates), len(paths), len(metrics)), np.nan)
+    values[date_ids, path_ids] = index.frame[list(metrics)].to_numpy(dtype='float64', na_value=np.nan)[rows]
+    return dates, values
+
+
+class RegionTensor:
+    """Dense date x region x metric array for comparing sibling regions.
+
+    Built in one vectorized pass from a HierarchyIndex: the rows of every
+    child of `parent` are scattered into a float array (NaN where a region
+    has no report for a date). Date-axis prefix sums make window means a
+    lookup, so comparing 2 or all 34 provinces costs the same handful of
+    array slices instead of one frame filter per region. When the index
+    grows by a later segment, extended() appends its dates instead of
+    scattering the whole history again.
+    """
+
+    def __init__(self, index, parent=(), metrics=METRICS):
+        self.metrics = list(metrics)
+        self.segments = [index]
+        self.children = children = index.children.get(parent, [])
+        self.regions = [child[-1] for child in children]
+        self._positions = {region: i for i, region in enumerate(self.regions)}
+
+        # Kode ISO 3166-2 tiap wilayah (dipakai untuk menggabungkan dengan geometri peta)
+        codes = index.frame['iso_3166_2_code'] if 'iso_3166_2_code' in index.frame.columns else None
+        self.codes = [None if codes is None else codes.iloc[index.blocks[child][0]] for child in children]
+        self.dates, self.values = dense_values(index, children, self.metrics)
+        self._sums, self._counts = _date_prefix(self.values)
+
+    def extended(self, index):
+        """Copy with the dates of `index`, a segment dated after this tensor, appended.
+
+        Only the new segment is scattered and summed; the existing arrays
+        are copied once into the longer ones.
+        """
+        dates, values = dense_values(index, self.children, self.metrics)
+        sums, counts = _date_prefix(values)
+        tensor = copy.copy(self)
+        tensor.segments = self.segments + [index]
+        tensor.dates = np.concatenate([self.dates, dates])
+        tensor.values = np.concatenate([self.values, values])
+        tensor._sums = np.concatenate([self._sums, self._sums[-1] + sums[1:]])
+        tensor._counts = np.concatenate([self._counts, self._counts[-1] + counts[1:]])
+        return tensor
+
+    def _window(self, start_date, end_date):
+        lo = np.searchsorted(self.dates, pd.Timestamp(start_date).to_datetime64(), side='left')
+        hi = np.searchsorted(self.dates, pd.Timestamp(end_date).to_datetime64(), side='right')
+        return lo, max(lo, hi)
+
+    def _columns(self, regions):
+        return np.array([self._positions[region] for region in regions], dtype=np.int64)
+
+    def series(self, regions, start_date, end_date, metric):
+        """Wide frame (date x region) of one metric, ready to plot."""
+        lo, hi = self._window(start_date, end_date)
+        block = self.values[lo:hi, self._columns(regions), self.metrics.index(metric)]
+        frame = pd.DataFrame(block, index=pd.Index(self.dates[lo:hi], name='date'), columns=list(regions))
+        return frame.reset_index()
+
+    def binned(self, start_date, end_date, metric, max_bins):
+        """(bin start dates, bins x region means) with at most `max_bins` equal date bins."""
+        lo, hi = self._window(start_date, end_date)
+        edges = np.unique(np.linspace(lo, hi, min(max_bins, hi - lo) + 1).astype(np.int64))
+        column = self.metrics.index(metric)
+        sums = np.diff(self._sums[edges, :, column], axis=0)
+        counts = np.diff(self._counts[edges, :, column], axis=0)
+        means = np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+        return self.dates[edges[:-1]], means
+
+    def ranking(self, regions, start_date, end_date, metric):
+        """Window mean of every metric per region, ranked by `metric` (highest first)."""
+        lo, hi = self._window(start_date, end_date)
+        columns = self._columns(regions)
+        sums = self._sums[hi, columns] - self._sums[lo, columns]
+        counts = self._counts[hi, columns] - self._counts[lo, columns]
+        means = np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+        table = pd.DataFrame(means, index=pd.Index(list(regions), name='region'), columns=self.metrics)
+        table = table.sort_values(metric, ascending=False)
+        table.insert(0, 'rank', np.arange(1, len(table) + 1))
+        return table
+
+
+def _date_prefix(values):
+    """Prefix sums and counts of the non-NaN values along the date axis, with a leading zero row."""
+    valid = ~np.isnan(values)
+    sums = np.zeros((len(values) + 1,) + values.shape[1:])
+    np.cumsum(np.where(valid, values, 0.0), axis=0, out=sums[1:])
+    counts = np.zeros(sums.shape, dtype=np.int64)
+    np.cumsum(valid, axis=0, out=counts[1:])
+    return sums, counts
+
+
+def tensor_for(index, previous=None):
+    """Province-level RegionTensor over `index`, extending `previous` if it covers a prefix of its segments."""
+    parts = segments(index)
+    covered = getattr(previous, 'segments', [])
+    if covered and len(covered) <= len(parts) and all(a is b for a, b in zip(covered, parts)):
+        tensor, rest = previous, parts[len(covered):]
+    else:
+        tensor, rest = RegionTensor(parts[0]), parts[1:]
+    for segment in rest:
+        tensor = tensor.extended(segment)
+    return tensor
+
+
+# Tensor terakhir yang dibangun di proses ini, diperpanjang untuk versi data berikutnya
+_latest = {}
+
+
+@lru_cache(maxsize=1)
+def _build(signature):
+    tensor = load_artifact('region_tensor', signature)
+    if tensor is None:
+        tensor = tensor_for(get_hierarchy_index(), _latest.get('tensor'))
+    _latest['tensor'] = tensor
+    return tensor
+
+
+def get_region_tensor():
+    """Province-level RegionTensor over the current dataset, built once per dataset version."""
+    return _build(dataset_signature())
@@ -1,24 +1,62 @@
-import pandas as pd
-import plotly.express as px
+import functools
+
 import streamlit as st
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
 
-# Load datasets
-df2020 = pd.read_csv("https://raw.githubusercontent.com/Ram4UnMi/bisnis_visualisasi_data/main/dataset/2020_ID_Region_Mobility_Report.csv")
-df2021 = pd.read_csv("https://raw.githubusercontent.com/Ram4UnMi/bisnis_visualisasi_data/main/dataset/2021_ID_Region_Mobility_Report.csv")
-df2022 = pd.read_csv("https://raw.githubusercontent.com/Ram4UnMi/bisnis_visualisasi_data/main/dataset/2022_ID_Region_Mobility_Report.csv")
+from profiling import PROFILE_ENABLED, Profiler
 
-# Add year column to each dataset
-df2020['year'] = 2020
-df2021['year'] = 2021
-df2022['year'] = 2022
+# Konfigurasi halaman harus jadi perintah Streamlit pertama. Sidebar dan kerangka judul digambar
+# sebelum modul berat (pandas, plotly, pyarrow) diimpor dan data dimuat, jadi halaman langsung tampil.
+st.set_page_config(page_title="Data Mobility Visualization", layout="wide")
 
-# Combine datasets
-df = pd.concat([df2020, df2021, df2022], ignore_index=True)
+# Sidebar - add image at the top
+st.sidebar.image("https://raw.githubusercontent.com/Ram4UnMi/bisnis_visualisasi_data/main/img/covidindo.jpg", use_container_width=True)
+
+# Sidebar filters
+st.sidebar.header("Filter Data")
 
-# Convert date column to datetime
-df['date'] = pd.to_datetime(df['date'])
+# Kerangka judul selama impor dan pemuatan data; dikosongkan begitu section siap digambar
+loading_slot = st.empty()
+loading_slot.title("📊 Data Mobility Visualization")
+
+# Profiling per tahap (aktif dengan DASHBOARD_PROFILE=1 atau ?profile=1)
+profiler = Profiler(enabled=PROFILE_ENABLED or st.query_params.get('profile') == '1')
+
+with st.spinner("Loading mobility data..."):
+    # sklearn, plotly.express dan geopandas tidak diimpor di sini: modul-modul ini mengimpornya saat benar-benar dipakai
+    with profiler.stage('imports'):
+        import pandas as pd
+
+        from aggregates import get_aggregate_cube
+        from artifacts import load_chart
+        from charts import region_charts
+        from comparison import get_region_tensor
+        from cluster_sweep import (ALL_REGIONS, K_VALUES, load_sweep, recommend_k, running_sweep, score_frame,
+                                   start_sweep, sweep_key, transition_matrix)
+        from clustering import DEFAULT_ENGINE, ENGINES, FEATURES, get_clustering
+        from data_loader import METRICS, dataset_version, load_mobility_data
+        from downsample import DEFAULT_POINT_BUDGET
+        from figures import (RESIDENTIAL, WORKPLACES, children_figure, choropleth_figure, cluster_figure,
+                             comparison_figure, decomposition_figure, figure_cache, sweep_figure)
+        from geometry import GEOMETRY_PATH, geometry_signature, get_province_geojson
+        from region_index import get_hierarchy_index
+        from sections import SECTION_INPUTS, is_fragment, section_args, widget_key
+        from timeseries import OVERLAYS, get_series_analytics, metric_label
+
+    # Load datasets (dibaca dari folder dataset/ dan di-cache per proses)
+    with profiler.stage('load_data') as stage:
+        df = load_mobility_data()
+        data_version = dataset_version()
+        stage.rows = len(df)
+        # Tahun yang tersedia mengikuti file laporan yang ada di dataset/
+        cluster_years = sorted(int(year) for year in df['year'].unique())
+    with profiler.stage('hierarchy_index'):
+        hierarchy_index = get_hierarchy_index()
+    with profiler.stage('aggregate_cube'):
+        aggregate_cube = get_aggregate_cube()
+    # Tensor wilayah dan geometri peta dimuat oleh section yang memakainya
+
+# Batas jumlah frame animasi peta; rentang tanggal yang lebih panjang dirata-rata per bin
+MAX_MAP_FRAMES = 60
 
 # Translation state
 if 'language' not in st.session_state:
@@ -30,22 +68,6 @@ def toggle_language():
     else:
         st.session_state.language = 'en'
 
-# Streamlit page configuration
-st.set_page_config(page_title="Data Mobility Visualization", layout="wide")
-
-# Sidebar - add image at the top
-st.sidebar.image("https://raw.githubusercontent.com/Ram4UnMi/bisnis_visualisasi_data/main/img/covidindo.jpg", use_container_width=True)
-
-# Sidebar filters
-st.sidebar.header("Filter Data")
-
-# Year selector for clustering
-selected_year = st.sidebar.selectbox(
-    "Select Year for Clustering Analysis:",
-    options=[2020, 2021, 2022],
-    index=0
-)
-
 min_date = df['date'].min()
 max_date = df['date'].max()
 
@@ -54,21 +76,34 @@ start_date, end_date = st.sidebar.date_input(
 )
 
 region_filter = st.sidebar.selectbox(
-    "Select Region:", options=df['sub_region_1'].dropna().unique(), index=0
+    "Select Region:", options=hierarchy_index.regions, index=0
+)
+
+# Drill-down ke sub_region_2 (kabupaten/kota); "All" memakai data tingkat provinsi
+ALL_SUB_REGIONS = "All"
+sub_regions = [path[-1] for path in hierarchy_index.children.get((region_filter,), [])]
+sub_region_filter = st.sidebar.selectbox(
+    "Select Sub-region:", options=[ALL_SUB_REGIONS] + sub_regions, index=0, disabled=not sub_regions
 )
+region_path = (region_filter,) if sub_region_filter == ALL_SUB_REGIONS else (region_filter, sub_region_filter)
+region_label = " / ".join(region_path)
 
-# Filter data based on user input
-filtered_df = df[(df['date'] >= pd.to_datetime(start_date)) &
-                 (df['date'] <= pd.to_datetime(end_date)) &
-                 (df['sub_region_1'] == region_filter)]
+# Anggaran titik per grafik; data yang lebih panjang di-downsample (LTTB / min-max)
+point_budget = st.sidebar.slider(
+    "Max points per chart:", min_value=100, max_value=2000, value=DEFAULT_POINT_BUDGET, step=100
+)
+
+# Garis analitik (rata-rata bergulir, tren, ...) yang ditumpuk di grafik retail dan tempat kerja
+overlays = st.sidebar.multiselect("Overlays:", options=list(OVERLAYS), default=[])
 
 # Text content in both languages
 texts = {
     'en': {
-        'title': f"📊 Data Mobility Visualization for {region_filter}",
+        'title': f"📊 Data Mobility Visualization for {region_label}",
         'date_range': f"### Date Range: {start_date} to {end_date}",
         'intro': "Explore how mobility patterns in retail, workplaces, and residential areas have changed over time. Use the filters on the left to customize your view.",
         'translate': 'Translate to Indonesian',
+        'section_loading': "Loading...",
         'retail_recreation_title': "Retail & Recreation vs Grocery & Pharmacy Mobility",
         'retail_recreation_insight': """
         ### Analysis & Strategic Insights
@@ -101,6 +136,26 @@ texts = {
           - **Day Comparison**: The clear difference between workdays and weekends indicates a significant change in social behavior.
           - **Recommendation**: Considering these patterns, public and business policies can be adjusted to accommodate changes in residential mobility.
         """,
+        'drilldown_title': "Regional Comparison",
+        'drilldown_caption': "Average change over the selected dates for {parent}, {selected} highlighted.",
+        'drilldown_caption_all': "Average change over the selected dates for every sub-region of {parent}.",
+        'comparison_title': "Multi-Region Comparison",
+        'comparison_ranking': "Ranking by average change",
+        'comparison_empty': "Select at least one region to compare.",
+        'map_title': "Province Map",
+        'map_missing': "No province boundaries found at {path}. Set DASHBOARD_GEOMETRY to a province-level shapefile or GeoJSON to show the map.",
+        'map_no_geopandas': "The province map needs geopandas to read {path}. Install it (pip install geopandas) to show the map.",
+        'map_invalid': "Could not read province boundaries from {path}: {error}",
+        'seasonality_title': "Trend & Seasonality",
+        'seasonality_caption': "Additive decomposition with a 7-day period: trend is the centred 7-day mean, seasonal is the average weekday effect, residual is what remains. Week-over-week is the change from the same weekday a week earlier.",
+        'sweep_title': "Choosing the Number of Clusters",
+        'sweep_intro': "KMeans is fitted for k = {k_min}..{k_max} on every year and every province. The elbow of the inertia curve and the highest silhouette suggest a k; the transition matrices show how provinces moved between clusters from one year to the next.",
+        'sweep_missing': "No sweep has been computed for the current data yet.",
+        'sweep_running': "Sweeping {done}/{total} scopes on {workers} worker(s)...",
+        'sweep_cancelled': "The sweep was cancelled.",
+        'sweep_failed': "The sweep failed: {error}",
+        'sweep_recommended': "Recommended k",
+        'sweep_transitions': "Cluster transitions (number of provinces, by most common cluster)",
         'clustering_title': "Mobility Pattern Clusters Analysis Dashboard",
         'clustering_subtitle': "Understanding Mobility Behavioral Patterns",
         'cluster_overview': """
@@ -170,10 +225,11 @@ texts = {
         'final_notes': 'Data sourced from Google Mobility Reports | Visualization by Turtle IF-3 Team'
     },
     'id': {
-        'title': f"📊 Visualisasi Mobilitas Data untuk {region_filter}",
+        'title': f"📊 Visualisasi Mobilitas Data untuk {region_label}",
         'date_range': f"### Rentang Tanggal: {start_date} hingga {end_date}",
         'intro': "Jelajahi bagaimana pola mobilitas di ritel, tempat kerja, dan area pemukiman telah berubah seiring waktu. Gunakan filter di sebelah kiri untuk menyesuaikan tampilan Anda.",
         'translate': 'Terjemahkan ke Bahasa Inggris',
+        'section_loading': "Memuat...",
         'retail_recreation_title': "Mobilitas Retail & Rekreasi vs Toko Kelontong & Farmasi",
         'retail_recreation_insight': """
         ### Analisis & Wawasan Strategis
@@ -206,6 +262,26 @@ texts = {
           - **Perbandingan Hari**: Perbedaan yang jelas antara hari kerja dan akhir pekan menunjukkan perubahan perilaku sosial yang signifikan.
           - **Rekomendasi**: Mempertimbangkan pola ini, kebijakan publik dan bisnis dapat disesuaikan untuk mengakomodasi perubahan dalam mobilitas residensial.
         """,
+        'drilldown_title': "Perbandingan Wilayah",
+        'drilldown_caption': "Rata-rata perubahan pada rentang tanggal terpilih untuk {parent}, {selected} disorot.",
+        'drilldown_caption_all': "Rata-rata perubahan pada rentang tanggal terpilih untuk setiap sub-wilayah {parent}.",
+        'comparison_title': "Perbandingan Multi-Wilayah",
+        'comparison_ranking': "Peringkat berdasarkan rata-rata perubahan",
+        'comparison_empty': "Pilih minimal satu wilayah untuk dibandingkan.",
+        'map_title': "Peta Provinsi",
+        'map_missing': "Batas provinsi tidak ditemukan di {path}. Atur DASHBOARD_GEOMETRY ke shapefile atau GeoJSON tingkat provinsi untuk menampilkan peta.",
+        'map_no_geopandas': "Peta provinsi membutuhkan geopandas untuk membaca {path}. Pasang dulu (pip install geopandas) untuk menampilkan peta.",
+        'map_invalid': "Batas provinsi di {path} tidak bisa dibaca: {error}",
+        'seasonality_title': "Tren & Musiman",
+        'seasonality_caption': "Dekomposisi aditif dengan periode 7 hari: tren adalah rata-rata 7 hari terpusat, musiman adalah efek rata-rata tiap hari, residual adalah sisanya. Minggu-ke-minggu adalah perubahan dari hari yang sama seminggu sebelumnya.",
+        'sweep_title': "Memilih Jumlah Klaster",
+        'sweep_intro': "KMeans dijalankan untuk k = {k_min}..{k_max} pada setiap tahun dan setiap provinsi. Siku kurva inersia dan silhouette tertinggi menyarankan nilai k; matriks transisi menunjukkan perpindahan provinsi antar klaster dari satu tahun ke tahun berikutnya.",
+        'sweep_missing': "Belum ada sapuan untuk data saat ini.",
+        'sweep_running': "Menyapu {done}/{total} cakupan dengan {workers} worker...",
+        'sweep_cancelled': "Sapuan dibatalkan.",
+        'sweep_failed': "Sapuan gagal: {error}",
+        'sweep_recommended': "k yang disarankan",
+        'sweep_transitions': "Transisi klaster (jumlah provinsi, berdasarkan klaster terbanyak)",
         'clustering_title': "Dashboard Analisis Klaster Pola Mobilitas",
         'clustering_subtitle': "Memahami Pola Perilaku Mobilitas",
         'cluster_overview': """
@@ -276,211 +352,380 @@ texts = {
     }
 }
 
-# Button to toggle language
-st.button(texts[st.session_state.language]['translate'], on_click=toggle_language)
 
-st.title(texts[st.session_state.language]['title'])
-st.markdown(texts[st.session_state.language]['date_range'])
-st.markdown(texts[st.session_state.language]['intro'])
+def page_section(name):
+    """Profil tiap section; section yang punya widget sendiri (SECTION_WIDGETS) dijadikan fragment."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profiler.stage(f"section:{name}"):
+                result = func(*args, **kwargs)
+            # Rerun fragment tidak sampai ke akhir skrip, jadi catatan ditulis di sini juga
+            profiler.flush()
+            return result
+        return st.fragment(wrapper) if is_fragment(name) else wrapper
+    return decorator
 
 
-# Retail & Recreation vs Grocery & Pharmacy
-st.header(texts[st.session_state.language]['retail_recreation_title'])
+def cached_figure(chart, key, build):
+    with profiler.stage(f"chart:{chart}"):
+        # Grafik yang sudah disiapkan precompute.py cukup dibaca; sisanya dibangun di sini
+        return figure_cache.get(chart, key, lambda: load_chart(chart, key) or build())
 
-# Membuat grafik garis tanpa penanda
-fig1 = px.line(
-    filtered_df,
-    x='date',
-    y=['retail_and_recreation_percent_change_from_baseline', 'grocery_and_pharmacy_percent_change_from_baseline'],
-    labels={"value": "% Change", "variable": "Category"},
-    line_shape='linear'  # Menentukan bentuk garis
-)
 
-# Menambahkan titik maksimum dan minimum untuk retail
-max_value_retail = filtered_df['retail_and_recreation_percent_change_from_baseline'].max()
-min_value_retail = filtered_df['retail_and_recreation_percent_change_from_baseline'].min()
+def filter_rows(region, start_date, end_date):
+    with profiler.stage('filter') as stage:
+        filtered_df = hierarchy_index.query(region, start_date, end_date)
+        stage.rows = len(filtered_df)
+    return filtered_df
 
-max_date_retail = filtered_df.loc[filtered_df['retail_and_recreation_percent_change_from_baseline'].idxmax(), 'date']
-min_date_retail = filtered_df.loc[filtered_df['retail_and_recreation_percent_change_from_baseline'].idxmin(), 'date']
 
-# Menambahkan titik maksimum dan minimum untuk grocery & pharmacy
-max_value_grocery = filtered_df['grocery_and_pharmacy_percent_change_from_baseline'].max()
-min_value_grocery = filtered_df['grocery_and_pharmacy_percent_change_from_baseline'].min()
+@page_section('header')
+def header_section(language, region, date_range):
+    st.title(texts[language]['title'])
+    st.markdown(texts[language]['date_range'])
+    st.markdown(texts[language]['intro'])
 
-max_date_grocery = filtered_df.loc[filtered_df['grocery_and_pharmacy_percent_change_from_baseline'].idxmax(), 'date']
-min_date_grocery = filtered_df.loc[filtered_df['grocery_and_pharmacy_percent_change_from_baseline'].idxmin(), 'date']
 
-# Menambahkan titik maksimum dan minimum ke grafik
-fig1.add_scatter(
-    x=[max_date_retail, min_date_retail],
-    y=[max_value_retail, min_value_retail],
-    mode='markers',
-    marker=dict(color='blue', size=10),
-    name='Retail Max/Min Points'
-)
+@page_section('retail_grocery')
+def retail_grocery_section(language, region, date_range, point_budget, overlays):
+    # Retail & Recreation vs Grocery & Pharmacy
+    st.header(texts[language]['retail_recreation_title'])
+    start_date, end_date = date_range
 
-fig1.add_scatter(
-    x=[max_date_grocery, min_date_grocery],
-    y=[max_value_grocery, min_value_grocery],
-    mode='markers',
-    marker=dict(color='orange', size=10),
-    name='Grocery Max/Min Points'
-)
+    # Grafik hanya dibangun ulang jika region, rentang tanggal, atau anggaran titik berubah.
+    # Bahasa tidak memengaruhi isi grafik, jadi tidak termasuk kunci cache.
+    charts = region_charts(hierarchy_index, aggregate_cube, data_version, region, start_date, end_date,
+                           point_budget, overlays, rows=filter_rows)
 
-# Mengubah warna garis berdasarkan perubahan
-for trace in fig1.data:
-    if trace.name == 'retail_and_recreation_percent_change_from_baseline':
-        trace.line.color = 'green' if trace.y[-1] > trace.y[0] else 'red'
-    else:
-        trace.line.color = 'red'  # Warna untuk grocery and pharmacy
-
-# Menampilkan grafik
-st.plotly_chart(fig1, use_container_width=True)
-st.markdown(texts[st.session_state.language]['retail_recreation_insight'])
-
-# Workplace Mobility
-st.header(texts[st.session_state.language]['workplace_title'])
-
-# Identifikasi titik maksimum dan minimum
-max_value = filtered_df['workplaces_percent_change_from_baseline'].max()
-min_value = filtered_df['workplaces_percent_change_from_baseline'].min()
-
-max_date = filtered_df.loc[filtered_df['workplaces_percent_change_from_baseline'].idxmax(), 'date']
-min_date = filtered_df.loc[filtered_df['workplaces_percent_change_from_baseline'].idxmin(), 'date']
-
-# Grafik utama
-fig2 = px.bar(
-    filtered_df,
-    x='date',
-    y='workplaces_percent_change_from_baseline',
-    color='workplaces_percent_change_from_baseline',
-    color_continuous_scale="Viridis"
-)
-
-# Tambahkan titik maksimum dan minimum
-fig2.add_scatter(
-    x=[max_date, min_date],
-    y=[max_value, min_value],
-    mode='markers',
-    marker=dict(color='red', size=10),
-    name='Max/Min Points'
-)
-
-st.plotly_chart(fig2, use_container_width=True)
-st.markdown(texts[st.session_state.language]['workplace_insight'])
-
-# Sub grafik yang hanya menampilkan grafik kenaikan data
-st.subheader("Workplace Mobility Increase Patterns")
-
-# Filter data untuk kenaikan (nilai positif)
-increase_df = filtered_df[filtered_df['workplaces_percent_change_from_baseline'] > 0]
+    # Membuat grafik garis (di-downsample sesuai anggaran titik), titik maks/min dari aggregate cube
+    fig1 = cached_figure('retail_grocery', *charts['retail_grocery'])
 
-fig_increase = px.bar(
-    increase_df,
-    x='date',
-    y='workplaces_percent_change_from_baseline',
-    color='workplaces_percent_change_from_baseline',
-    color_continuous_scale="Viridis",
-    title="Workplace Mobility Increase Only"
-)
+    # Menampilkan grafik
+    st.plotly_chart(fig1, use_container_width=True)
+    st.markdown(texts[language]['retail_recreation_insight'])
 
-st.plotly_chart(fig_increase, use_container_width=True)
 
-# Sub grafik yang hanya menampilkan grafik penurunan data
-st.subheader("Workplace Mobility Decrease Patterns")
+@page_section('workplace')
+def workplace_section(language, region, date_range, point_budget, overlays):
+    # Workplace Mobility
+    st.header(texts[language]['workplace_title'])
+    start_date, end_date = date_range
+    charts = region_charts(hierarchy_index, aggregate_cube, data_version, region, start_date, end_date,
+                           point_budget, overlays, rows=filter_rows)
+
+    # Identifikasi titik maksimum dan minimum
+    fig2 = cached_figure('workplace', *charts['workplace'])
+
+    st.plotly_chart(fig2, use_container_width=True)
+    st.markdown(texts[language]['workplace_insight'])
+
+    # Sub grafik yang hanya menampilkan grafik kenaikan data
+    st.subheader("Workplace Mobility Increase Patterns")
+
+    # Filter data untuk kenaikan (nilai positif)
+    fig_increase = cached_figure('workplace_increase', *charts['workplace_increase'])
+
+    st.plotly_chart(fig_increase, use_container_width=True)
+
+    # Sub grafik yang hanya menampilkan grafik penurunan data
+    st.subheader("Workplace Mobility Decrease Patterns")
+
+    # Filter data untuk penurunan (nilai negatif)
+    fig_decrease = cached_figure('workplace_decrease', *charts['workplace_decrease'])
+
+    st.plotly_chart(fig_decrease, use_container_width=True)
+
+
+@page_section('residential')
+def residential_section(language, region, date_range):
+    # Residential Mobility Bar Chart
+    st.header(texts[language]['residential_title'])
+    start_date, end_date = date_range
+
+    # Hitung rata-rata perubahan mobilitas per hari
+    fig_bar = cached_figure('residential_weekday', *region_charts(
+        hierarchy_index, aggregate_cube, data_version, region, start_date, end_date, point_budget=None
+    )['residential_weekday'])
+
+    st.plotly_chart(fig_bar, use_container_width=True)
+
+
+@page_section('seasonality')
+def seasonality_section(language, region, date_range, point_budget):
+    # Dekomposisi musiman & perubahan minggu-ke-minggu, dihitung untuk semua wilayah sekaligus
+    st.header(texts[language]['seasonality_title'])
+    start_date, end_date = date_range
+
+    # Pemilih metrik ada di dalam section, jadi mengubahnya hanya menjalankan ulang section ini
+    metric = st.selectbox("Decompose metric:", options=METRICS, index=METRICS.index(RESIDENTIAL),
+                          format_func=metric_label, key=widget_key('seasonality', 'seasonality_metric'))
+    components = ['observed', 'trend', 'seasonal', 'residual', 'wow_delta']
+    chart_key = (data_version, region, start_date, end_date, metric, point_budget)
+    fig_seasonal = cached_figure('seasonality', chart_key, lambda: decomposition_figure(
+        get_series_analytics(metric).frame(region, start_date, end_date, components)
+        .rename(columns={'wow_delta': 'week-over-week'}),
+        point_budget
+    ))
+    st.plotly_chart(fig_seasonal, use_container_width=True)
+    st.caption(texts[language]['seasonality_caption'])
+
+
+@page_section('drilldown')
+def drilldown_section(language, region, date_range):
+    # Perbandingan sub-wilayah dalam provinsi terpilih (atau antar provinsi jika tidak ada sub-wilayah)
+    st.header(texts[language]['drilldown_title'])
+    start_date, end_date = date_range
+    parent = region[:1] if hierarchy_index.children.get(region[:1]) else ()
+    # Provinsi dengan sub-wilayah + "All": tampilkan anak-anaknya tanpa sorotan
+    selected = region[len(parent)] if len(region) > len(parent) else None
+
+    # Pemilih metrik ada di dalam section, jadi mengubahnya hanya menjalankan ulang section ini
+    metric = st.selectbox("Compare sub-regions by:", options=METRICS, index=METRICS.index(WORKPLACES),
+                          key=widget_key('drilldown', 'drilldown_metric'))
+
+    fig_children = cached_figure('drilldown', (data_version, parent, region, start_date, end_date, metric), lambda: (
+        children_figure(aggregate_cube.children_summary(parent, start_date, end_date, metric), metric,
+                        selected=selected)
+    ))
+    st.plotly_chart(fig_children, use_container_width=True)
+    caption = 'drilldown_caption' if selected is not None else 'drilldown_caption_all'
+    st.caption(texts[language][caption].format(parent=" / ".join(parent) or "Indonesia", selected=selected))
+
+
+@page_section('comparison')
+def comparison_section(language, date_range, point_budget):
+    # Beberapa provinsi sekaligus, dibaca dari satu tensor tanggal x wilayah x metrik
+    st.header(texts[language]['comparison_title'])
+    start_date, end_date = date_range
+
+    with profiler.stage('region_tensor'):
+        region_tensor = get_region_tensor()
+
+    # Semua pemilih ada di dalam section, jadi mengubahnya hanya menjalankan ulang section ini
+    compared = st.multiselect("Compare regions:", options=region_tensor.regions, default=region_tensor.regions[:4],
+                              key=widget_key('comparison', 'comparison_regions'))
+    if st.checkbox("All regions", key=widget_key('comparison', 'comparison_all')):
+        compared = region_tensor.regions
+    metric_column, layout_column = st.columns(2)
+    metric = metric_column.selectbox("Comparison metric:", options=METRICS, index=METRICS.index(WORKPLACES),
+                                     key=widget_key('comparison', 'comparison_metric'))
+    layout = layout_column.radio("Layout:", ["Overlay", "Small multiples"], horizontal=True,
+                                 key=widget_key('comparison', 'comparison_layout'))
+
+    if not compared:
+        st.info(texts[language]['comparison_empty'])
+        return
+
+    small_multiples = layout == "Small multiples"
+    chart_key = (data_version, tuple(compared), start_date, end_date, metric, small_multiples, point_budget)
+    fig_compare = cached_figure('comparison', chart_key, lambda: comparison_figure(
+        region_tensor.series(compared, start_date, end_date, metric), compared, metric, small_multiples, point_budget
+    ))
+    st.plotly_chart(fig_compare, use_container_width=True)
+
+    st.subheader(texts[language]['comparison_ranking'])
+    st.dataframe(region_tensor.ranking(compared, start_date, end_date, metric).round(2), use_container_width=True)
+
+
+@page_section('map')
+def map_section(language, date_range):
+    # Peta choropleth provinsi, digabung lewat iso_3166_2_code
+    st.header(texts[language]['map_title'])
+    # Versi file batas ikut kunci cache grafik, jadi mengganti file langsung menggambar ulang peta
+    geometry_version = geometry_signature()
+    if geometry_version is None:
+        st.info(texts[language]['map_missing'].format(path=GEOMETRY_PATH))
+        return
+    with profiler.stage('geometry'):
+        try:
+            province_geojson = get_province_geojson()
+        except Exception as error:  # file rusak atau tanpa kolom kode provinsi
+            st.warning(texts[language]['map_invalid'].format(path=GEOMETRY_PATH, error=error))
+            return
+    if province_geojson is None:
+        st.info(texts[language]['map_no_geopandas'].format(path=GEOMETRY_PATH))
+        return
+    start_date, end_date = date_range
+    with profiler.stage('region_tensor'):
+        region_tensor = get_region_tensor()
+
+    metric_column, mode_column = st.columns(2)
+    metric = metric_column.selectbox("Map metric:", options=METRICS, index=METRICS.index(WORKPLACES),
+                                     key=widget_key('map', 'map_metric'))
+    mode = mode_column.radio("Map view:", ["Range average", "Animate over time"], horizontal=True,
+                             key=widget_key('map', 'map_view'))
+
+    # Animasi hanya mengganti nilai z per frame; geometri dikirim sekali per grafik
+    bins = MAX_MAP_FRAMES if mode == "Animate over time" else 1
+    fig_map = cached_figure('map', (data_version, geometry_version, start_date, end_date, metric, bins), lambda: choropleth_figure(
+        province_geojson, region_tensor.codes, region_tensor.regions,
+        *region_tensor.binned(start_date, end_date, metric, bins), metric
+    ))
+    st.plotly_chart(fig_map, use_container_width=True)
+
+
+@page_section('clustering')
+def clustering_section(language):
+    # Clustering Analysis
+    st.header(texts[language]['clustering_title'])
+    st.markdown(texts[language]['clustering_subtitle'])
+    st.markdown(texts[language]['cluster_overview'])
+
+    # Pemilih tahun & mesin ada di dalam section, jadi mengubahnya hanya menjalankan ulang section ini
+    year_column, engine_column = st.columns(2)
+    selected_year = year_column.selectbox(
+        "Select Year for Clustering Analysis:",
+        options=cluster_years,
+        index=0,
+        key=widget_key('clustering', 'cluster_year')
+    )
 
-# Filter data untuk penurunan (nilai negatif)
-decrease_df = filtered_df[filtered_df['workplaces_percent_change_from_baseline'] < 0]
+    # Mesin klaster: exact (KMeans) atau minibatch (streaming, hemat memori)
+    cluster_engine = engine_column.selectbox(
+        "Clustering Engine:",
+        options=ENGINES,
+        index=ENGINES.index(DEFAULT_ENGINE),
+        key=widget_key('clustering', 'cluster_engine')
+    )
 
-fig_decrease = px.bar(
-    decrease_df,
-    x='date',
-    y='workplaces_percent_change_from_baseline',
-    color='workplaces_percent_change_from_baseline',
-    color_continuous_scale="Viridis",
-    title="Workplace Mobility Decrease Only"
-)
+    # Model klaster di-cache per tahun, jadi KMeans hanya dijalankan sekali per tahun
+    with profiler.stage('clustering') as stage:
+        clustering_df, cluster_stats, cluster_model = get_clustering(
+            selected_year, FEATURES, n_clusters=3, engine=cluster_engine
+        )
+        stage.rows = 0 if clustering_df is None else len(clustering_df)
+
+    if clustering_df is not None:
+        fig_cluster = cached_figure(
+            'clusters', (selected_year, cluster_engine, cluster_model.data_hash), lambda: cluster_figure(clustering_df)
+        )
+        st.plotly_chart(fig_cluster, use_container_width=True)
+        st.markdown(texts[language]['clustering_insight'])
+
+        # Display cluster statistics with enhanced formatting
+        st.subheader("Cluster Statistics")
+        st.dataframe(cluster_stats.round(2), use_container_width=True)
+
+        # Display detailed cluster characteristics and recommendations
+        st.markdown(texts[language]['cluster_characteristics'])
+        st.markdown(texts[language]['cluster_recommendations'])
+    else:
+        st.warning(f"No data available for clustering in {selected_year}")
 
-st.plotly_chart(fig_decrease, use_container_width=True)
 
-# Residential Mobility Bar Chart
-st.header(texts[st.session_state.language]['residential_title'])
+@st.fragment(run_every=1)
+def sweep_progress(language, job):
+    # Polling tiap detik, hanya fragment kecil ini yang dijalankan ulang selama sapuan berjalan
+    if job.status == 'running':
+        st.progress(job.progress, text=texts[language]['sweep_running'].format(
+            done=job.done, total=job.total or '?', workers=job.workers))
+        if st.button("Cancel sweep", key=widget_key('cluster_sweep', 'sweep_cancel')):
+            job.cancel()
+    else:
+        st.rerun()  # selesai/dibatalkan: tampilkan hasil atau status di section induk
+
+
+@page_section('cluster_sweep')
+def cluster_sweep_section(language):
+    st.header(texts[language]['sweep_title'])
+    st.markdown(texts[language]['sweep_intro'].format(k_min=K_VALUES[0], k_max=K_VALUES[-1]))
+
+    # Hasil sapuan disimpan di cache/sweeps/, jadi grafik langsung tampil tanpa menghitung ulang
+    key = sweep_key(cluster_years, K_VALUES)
+    result = load_sweep(key)
+    if result is None:
+        job = running_sweep(cluster_years, K_VALUES)
+        if st.button("Run sweep", disabled=job is not None and job.status == 'running',
+                     key=widget_key('cluster_sweep', 'sweep_run')):
+            job = start_sweep(cluster_years, K_VALUES)
+        if job is not None and job.status == 'running':
+            sweep_progress(language, job)
+        elif job is not None and job.status == 'cancelled':
+            st.info(texts[language]['sweep_cancelled'])
+        elif job is not None and job.status == 'failed':
+            st.error(texts[language]['sweep_failed'].format(error=job.error))
+        else:
+            st.info(texts[language]['sweep_missing'])
+        return
+
+    scope_column, k_column = st.columns(2)
+    scope = scope_column.selectbox("Sweep scope:", options=[ALL_REGIONS] + list(hierarchy_index.regions), index=0,
+                                   key=widget_key('cluster_sweep', 'sweep_scope'))
+    scores = score_frame(result, scope)
+    recommended = recommend_k(scores)
+    fig_sweep = cached_figure('sweep', (key, scope), lambda: sweep_figure(scores, recommended))
+    st.plotly_chart(fig_sweep, use_container_width=True)
+
+    st.subheader(texts[language]['sweep_recommended'])
+    st.dataframe(pd.DataFrame.from_dict(recommended, orient='index', columns=['elbow', 'silhouette']).rename_axis('year'),
+                 use_container_width=True)
+
+    # Transisi dihitung dari model seluruh wilayah, jadi tidak bergantung pada cakupan di atas
+    transition_k = k_column.selectbox("Transition k:", options=result['k_values'],
+                                      index=result['k_values'].index(3) if 3 in result['k_values'] else 0,
+                                      key=widget_key('cluster_sweep', 'transition_k'))
+    st.subheader(texts[language]['sweep_transitions'])
+    years = result['years']
+    for year_from, year_to in zip(years, years[1:]):
+        matrix = transition_matrix(result, transition_k, year_from, year_to)
+        if matrix is not None:
+            st.markdown(f"**{year_from} → {year_to}**")
+            st.dataframe(matrix, use_container_width=True)
+
+
+# Button to toggle language (di luar fragment: bahasa dipakai semua section)
+st.button(texts[st.session_state.language]['translate'], on_click=toggle_language)
 
-# Hitung rata-rata perubahan mobilitas per hari
-daily_avg = filtered_df.groupby(filtered_df['date'].dt.weekday)['residential_percent_change_from_baseline'].mean()
-daily_avg.index = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+# Input global; tiap section hanya menerima input yang dideklarasikan di sections.SECTION_INPUTS
+inputs = {
+    'language': st.session_state.language,
+    'region': region_path,
+    'date_range': (start_date, end_date),
+    'point_budget': point_budget,
+    'overlays': tuple(overlays),
+}
 
-# Buat grafik batang dengan penekanan warna
-fig_bar = px.bar(
-    daily_avg,
-    x=daily_avg.index,
-    y=daily_avg.values,
-    labels={"x": "Day", "y": "Average % Change"},
-    color=daily_avg.values,
-    color_continuous_scale=px.colors.sequential.Reds,  # Menggunakan skala warna merah
-    title="Average Residential Mobility Change by Day"
-)
+sections = {
+    'header': header_section,
+    'retail_grocery': retail_grocery_section,
+    'workplace': workplace_section,
+    'residential': residential_section,
+    'seasonality': seasonality_section,
+    'drilldown': drilldown_section,
+    'comparison': comparison_section,
+    'map': map_section,
+    'clustering': clustering_section,
+    'cluster_sweep': cluster_sweep_section,
+}
 
-# Soroti akhir pekan dengan warna yang berbeda
-fig_bar.update_traces(marker_color=["blue"]*5 + ["orange"]*2)  # Warna biru untuk hari kerja, oranye untuk akhir pekan
-
-st.plotly_chart(fig_bar, use_container_width=True)
-
-# Clustering Analysis
-st.header(texts[st.session_state.language]['clustering_title'])
-st.markdown(texts[st.session_state.language]['clustering_subtitle'])
-st.markdown(texts[st.session_state.language]['cluster_overview'])
-
-# Filter data for the selected year
-clustering_df = df[df['year'] == selected_year].copy()
-
-features = [
-    'retail_and_recreation_percent_change_from_baseline',
-    'grocery_and_pharmacy_percent_change_from_baseline',
-    'parks_percent_change_from_baseline',
-    'transit_stations_percent_change_from_baseline',
-    'workplaces_percent_change_from_baseline',
-    'residential_percent_change_from_baseline'
-]
-
-clustering_df = clustering_df.dropna(subset=features)
-
-if len(clustering_df) > 0:
-    scaler = StandardScaler()
-    X = scaler.fit_transform(clustering_df[features])
-    
-    n_clusters = 3
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-    clustering_df['cluster'] = kmeans.fit_predict(X)
-    
-    fig_cluster = px.scatter(
-        clustering_df,
-        x='retail_and_recreation_percent_change_from_baseline',
-        y='workplaces_percent_change_from_baseline',
-        color='cluster',
-        labels={
-            'retail_and_recreation_percent_change_from_baseline': 'Retail & Recreation Change (%)',
-            'workplaces_percent_change_from_baseline': 'Workplace Change (%)'
-        },
-        color_continuous_scale='Viridis'
-    )
-    st.plotly_chart(fig_cluster, use_container_width=True)
-    st.markdown(texts[st.session_state.language]['clustering_insight'])
-    
-    # Display cluster statistics with enhanced formatting
-    st.subheader("Cluster Statistics")
-    cluster_stats = clustering_df.groupby('cluster')[features].mean().round(2)
-    st.dataframe(cluster_stats, use_container_width=True)
-    
-    # Display detailed cluster characteristics and recommendations
-    st.markdown(texts[st.session_state.language]['cluster_characteristics'])
-    st.markdown(texts[st.session_state.language]['cluster_recommendations'])
-else:
-    st.warning(f"No data available for clustering in {selected_year}")
+# Semua section tampil dulu sebagai placeholder, lalu diisi satu per satu sesuai urutan halaman
+loading_slot.empty()
+slots = {name: st.empty() for name in SECTION_INPUTS}
+for slot in slots.values():
+    slot.caption(texts[st.session_state.language]['section_loading'])
+for name, slot in slots.items():
+    with slot.container():
+        sections[name](**section_args(name, inputs))
 
 # Final Notes
 st.caption(texts[st.session_state.language]['final_notes'])
 
+# Statistik cache grafik per grafik (hit/miss/eviction) untuk memantau efektivitas cache
+with st.sidebar.expander("Chart cache"):
+    st.dataframe(pd.DataFrame.from_dict(figure_cache.counters(), orient='index'), use_container_width=True)
+
+# Rincian profiling rerun ini (hanya saat profiling aktif)
+if profiler.enabled:
+    with st.sidebar.expander("Profiling"):
+        profile_df = pd.DataFrame(profiler.summary())
+        profile_df['ms'] = (profile_df.pop('seconds') * 1000).round(2)
+        # Memori hanya terisi untuk stage tingkat atas saat DASHBOARD_PROFILE_MEMORY=1
+        profile_df['alloc_kb'] = (profile_df.pop('alloc_delta_bytes').astype('float64') / 1024).round(1)
+        profile_df['peak_kb'] = (profile_df.pop('peak_bytes').astype('float64') / 1024).round(1)
+        st.dataframe(profile_df.set_index('name'), use_container_width=True)
+    profiler.flush()
+
 # Sidebar creators section
 st.sidebar.markdown("---")
 st.sidebar.markdown("**Anggota Kelompok:**")
@@ -0,0 +1,354 @@
+import hashlib
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow opsional, tanpa itu kita kembali ke CSV
+    pa = feather = None
+
+BASE_DIR = Path(__file__).resolve().parent
+DATASET_DIR = BASE_DIR / "dataset"
+CACHE_DIR = BASE_DIR / "cache"
+PARTS_DIR = CACHE_DIR / "parts"
+REMOTE_URL = "https://raw.githubusercontent.com/Ram4UnMi/bisnis_visualisasi_data/main/dataset/{name}"
+
+# Nama file bawaan; dipakai untuk unduhan dari GitHub jika folder dataset/ kosong
+YEARS = (2020, 2021, 2022)
+FILE_TEMPLATE = "{year}_ID_Region_Mobility_Report.csv"
+REPORT_PATTERN = "*_Region_Mobility_Report.csv"
+YEAR_PREFIX = re.compile(r"^(\d{4})_")
+
+REGION_COLUMNS = [
+    'country_region_code',
+    'country_region',
+    'sub_region_1',
+    'sub_region_2',
+    'iso_3166_2_code',
+    'place_id'
+]
+
+METRICS = [
+    'retail_and_recreation_percent_change_from_baseline',
+    'grocery_and_pharmacy_percent_change_from_baseline',
+    'parks_percent_change_from_baseline',
+    'transit_stations_percent_change_from_baseline',
+    'workplaces_percent_change_from_baseline',
+    'residential_percent_change_from_baseline'
+]
+
+# Selalu kosong untuk data Indonesia
+DEAD_COLUMNS = ['metro_area', 'census_fips_code']
+
+
+def report_year(path):
+    """Year from a report's file name ("2021_ID_..."), or None to take it from the dates."""
+    match = YEAR_PREFIX.match(Path(path).name)
+    return int(match.group(1)) if match else None
+
+
+def dataset_files(directory=DATASET_DIR):
+    """Return (year, local path) for every mobility report in `directory`.
+
+    Any *_Region_Mobility_Report.csv is picked up, so adding a year is just
+    dropping its file in dataset/. Without local files the bundled
+    2020-2022 names are returned and read from GitHub.
+    """
+    paths = sorted(directory.glob(REPORT_PATTERN))
+    if not paths:
+        return [(year, directory / FILE_TEMPLATE.format(year=year)) for year in YEARS]
+    return [(report_year(path), path) for path in paths]
+
+
+def dataset_signature(directory=DATASET_DIR):
+    """Cheap fingerprint of the report CSVs, used as the cache key.
+
+    Adding, editing or replacing a file changes the file list or a file's
+    mtime/size and therefore the signature, so the next call to
+    load_mobility_data() picks it up.
+    """
+    signature = []
+    for year, path in dataset_files(directory):
+        try:
+            stat = path.stat()
+            signature.append((year, path.name, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((year, path.name, None, None))
+    return tuple(signature)
+
+
+def dataset_version(signature=None):
+    """Short hash of the dataset signature, used to name derived artifacts."""
+    if signature is None:
+        signature = dataset_signature()
+    return hashlib.sha1(repr(signature).encode()).hexdigest()[:12]
+
+
+def _with_year(report, year):
+    # Tanpa tahun di nama file, tahun diambil dari tanggal tiap baris
+    report['year'] = year if year is not None else pd.to_datetime(report['date']).dt.year
+    return report
+
+
+def _read_report(year, path):
+    # File lokal diutamakan, URL GitHub hanya sebagai cadangan
+    if path.exists():
+        report = pd.read_csv(path)
+    else:
+        report = pd.read_csv(REMOTE_URL.format(name=path.name))
+    return _with_year(report, year)
+
+
+def read_csv_frame(signature, directory=DATASET_DIR):
+    """Combined frame straight from the CSVs, with pandas' default dtypes."""
+    reports = [_read_report(year, directory / name) for year, name, _, _ in signature]
+    df = pd.concat(reports, ignore_index=True)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def _smallest_int_dtype(values):
+    low, high = values.min(), values.max()
+    for dtype in ('Int8', 'Int16', 'Int32'):
+        info = np.iinfo(dtype.lower())
+        if pd.isna(low) or (info.min <= low and high <= info.max):
+            return dtype
+    return 'Int64'
+
+
+def compact_frame(df):
+    """Shrink the raw CSV frame: categorical regions, small nullable ints."""
+    df = df.drop(columns=[c for c in DEAD_COLUMNS if c in df.columns])
+    for column in REGION_COLUMNS:
+        # Lewat 'str' dulu: kolom yang seluruhnya kosong (sub_region_2) tetap berkategori teks, bukan float
+        df[column] = df[column].astype('str').astype('category')
+    for column in METRICS:
+        df[column] = df[column].astype(_smallest_int_dtype(df[column]))
+    df['year'] = df['year'].astype('int16')
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+_store_lock = threading.Lock()
+
+
+def _part_name(report_name, number):
+    return f"{Path(report_name).stem}-{number:04d}.feather"
+
+
+def _write_part(frame, path):
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    feather.write_feather(frame, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+
+def _ingest(year, path, entry, store):
+    """Parse what is new in one report into parts; return its updated manifest entry."""
+    if not path.exists():
+        # Hanya tersedia dari GitHub: diunduh sekali, lalu dipakai dari part yang tersimpan
+        if entry is not None and entry.get('remote'):
+            return entry
+        part = _part_name(path.name, 0)
+        _write_part(compact_frame(read_csv_frame([(year, path.name, None, None)], path.parent)), store / part)
+        return {'remote': True, 'parts': [part]}
+
+    stat = path.stat()
+    if entry is not None and (entry.get('size'), entry.get('mtime_ns')) == (stat.st_size, stat.st_mtime_ns):
+        return entry
+
+    data = path.read_bytes()
+    header = data[:data.find(b"\n") + 1]
+    # Seluruh bagian yang sudah di-parse harus utuh (bukan hanya ujungnya): suntingan di tengah file
+    # dengan panjang sama lalu ditambah baris baru tetap terdeteksi dan file di-parse ulang
+    appended = False
+    if entry is not None and entry.get('prefix_digest') and stat.st_size > entry['parsed_bytes']:
+        digest = hashlib.sha1(data[:entry['parsed_bytes']])
+        appended = digest.hexdigest() == entry['prefix_digest']
+    if not appended:
+        digest = hashlib.sha1(header)
+    start = entry['parsed_bytes'] if appended else len(header)
+
+    # Hanya baris lengkap; baris terakhir yang belum selesai ditulis menunggu sinkronisasi berikutnya
+    body = data[start:]
+    body = body[:body.rfind(b"\n") + 1]
+    digest.update(body)
+    parts = list(entry['parts']) if appended else []
+    if body:
+        report = _with_year(pd.read_csv(io.BytesIO(header + body)), year)
+        part = _part_name(path.name, len(parts))
+        _write_part(compact_frame(report), store / part)
+        parts.append(part)
+
+    return {
+        'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'parsed_bytes': start + len(body),
+        'prefix_digest': digest.hexdigest(), 'parts': parts, 'appended': appended,
+    }
+
+
+def sync_columnar_store(signature=None, directory=DATASET_DIR, store=PARTS_DIR):
+    """Bring the per-report Feather parts in line with the CSVs; return the part paths.
+
+    Unchanged reports are skipped. A report that only grew at the end (a
+    digest of every byte parsed last time still matches) has just the
+    appended lines parsed, into one extra part; any other change re-parses
+    that report alone. Parts of reports that disappeared are deleted.
+    Uncompressed parts can be memory-mapped, so reading them back is mostly
+    a page-cache read instead of a CSV parse.
+
+    The structures derived from the frame follow the parts: the hierarchy
+    index, aggregate cube and region tensor of the previous version are
+    extended with the new parts alone when those only add later dates (see
+    region_index.extend_index), and seasonal analytics are derived per
+    viewed region. Cluster models are keyed per year, so an append refits
+    only the year that changed, warm-started from its previous centroids.
+    """
+    if signature is None:
+        signature = dataset_signature(directory)
+    with _store_lock:
+        store.mkdir(parents=True, exist_ok=True)
+        manifest_path = store / "manifest.json"
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+
+        updated = {}
+        for year, name, _, _ in signature:
+            updated[name] = _ingest(year, directory / name, manifest.get(name), store)
+        if updated != manifest:
+            tmp_path = manifest_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(updated, indent=1))
+            os.replace(tmp_path, manifest_path)
+
+        # Buang part yang tidak lagi dirujuk manifest
+        live = {part for entry in updated.values() for part in entry['parts']}
+        for stale in store.glob("*.feather"):
+            if stale.name not in live:
+                stale.unlink(missing_ok=True)
+        return [store / part for _, name, _, _ in signature for part in updated[name]['parts']]
+
+
+def part_fingerprints(paths):
+    """(name, mtime, size) of every part; a part rewritten under the same name gets a new one."""
+    fingerprints = []
+    for path in paths:
+        stat = Path(path).stat()
+        fingerprints.append((Path(path).name, stat.st_mtime_ns, stat.st_size))
+    return tuple(fingerprints)
+
+
+def _widen_pandas_metadata(table, first_schema):
+    """Point the stored pandas dtypes (taken from the first part) at the promoted integer widths."""
+    metadata = table.schema.metadata or {}
+    if b'pandas' not in metadata:
+        return table
+    pandas_meta = json.loads(metadata[b'pandas'])
+    for column in pandas_meta['columns']:
+        name = column['name']
+        if name not in table.column_names or not pa.types.is_integer(table.schema.field(name).type):
+            continue
+        width = table.schema.field(name).type.bit_width
+        if first_schema.field(name).type.bit_width != width:
+            column['numpy_type'] = re.sub(r"\d+", str(width), column['numpy_type'])
+            column['pandas_type'] = re.sub(r"\d+", str(width), column['pandas_type'])
+    return table.replace_schema_metadata({**metadata, b'pandas': json.dumps(pandas_meta).encode()})
+
+
+def _typed_null_dictionaries(table):
+    """Give all-null category columns (dictionary of type null) an empty string dictionary.
+
+    Arrow cannot unify null dictionaries, and a column that is empty in one
+    part but not in another would not concatenate either.
+    """
+    typed = pa.dictionary(pa.int32(), pa.string())
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type) and pa.types.is_null(field.type.value_type):
+            chunks = [pa.DictionaryArray.from_arrays(pa.nulls(len(chunk), pa.int32()), pa.array([], pa.string()))
+                      for chunk in table.column(i).chunks]
+            table = table.set_column(i, pa.field(field.name, typed), pa.chunked_array(chunks, type=typed))
+    return table
+
+
+def read_columnar(paths):
+    """Memory-map one Feather file or a list of parts and return one frame."""
+    if isinstance(paths, (str, Path)):
+        paths = [paths]
+    tables = [_typed_null_dictionaries(feather.read_table(path, memory_map=True)) for path in paths]
+    # Part bisa punya lebar integer berbeda (Int8 vs Int16); permissive memilih yang cukup untuk semua
+    table = pa.concat_tables(tables, promote_options='permissive').unify_dictionaries()
+    df = _widen_pandas_metadata(table, tables[0].schema).to_pandas()
+    # Kategori gabungan berurutan kemunculan; urutkan lagi seperti astype('category'). Kategori
+    # kosong keluar dari Arrow sebagai object, jadi semuanya diseragamkan ke 'str'
+    for column in REGION_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].cat.set_categories(df[column].cat.categories.astype('str').sort_values())
+    return df
+
+
+@lru_cache(maxsize=1)
+def _load(signature):
+    if feather is None:
+        return compact_frame(read_csv_frame(signature))
+    return read_columnar(sync_columnar_store(signature))
+
+
+def load_mobility_data():
+    """Combined 2020-2022 mobility frame with `year` and parsed `date`.
+
+    The frame is built once per process and shared by every Streamlit
+    session, so callers must treat it as read-only (use .copy() before
+    adding columns).
+    """
+    return _load(dataset_signature())
+
+
+def _measure(mode):
+    import resource
+
+    signature = dataset_signature()
+    parts = None if mode == 'csv' else sync_columnar_store(signature)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == 'csv':
+        df = read_csv_frame(signature)
+    else:
+        df = read_columnar(parts)
+    elapsed = time.perf_counter() - start
+    frame_mb = df.memory_usage(deep=True).sum() / 1e6
+    # ru_maxrss dalam KiB di Linux
+    rss_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+    print(f"{mode:>8}: load {elapsed * 1000:7.1f} ms | frame {frame_mb:6.2f} MB | peak RSS growth {rss_mb:6.1f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        _measure(sys.argv[1])
+        sys.exit()
+
+    _load.cache_clear()
+
+    start = time.perf_counter()
+    df = load_mobility_data()
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    load_mobility_data()
+    warm = time.perf_counter() - start
+
+    print(f"rows: {len(df):,}")
+    print(f"cold load: {cold * 1000:.1f} ms")
+    print(f"warm load: {warm * 1000:.3f} ms")
+
+    # Tiap mode diukur di proses terpisah agar RSS-nya tidak tercampur
+    if feather is not None:
+        for mode in ('csv', 'columnar'):
+            subprocess.run([sys.executable, __file__, mode], check=True)
@@ -0,0 +1,86 @@
+import numpy as np
+
+DEFAULT_POINT_BUDGET = 500
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype('float64')
+    return values.astype('float64')
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of the n_out points to keep.
+
+    NaN points are ignored; the first and last valid points are always kept.
+    """
+    valid = np.flatnonzero(~np.isnan(y))
+    if n_out >= len(valid) or n_out < 3:
+        return valid
+    x, y = x[valid], y[valid]
+    n = len(y)
+
+    every = (n - 2) / (n_out - 2)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Luas segitiga antara titik terpilih sebelumnya, kandidat, dan rata-rata bucket berikutnya
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return valid[selected]
+
+
+def minmax_indices(y, n_out):
+    """Min/max bucketing: the lowest and highest point of n_out // 2 buckets."""
+    n = len(y)
+    n_buckets = max(1, n_out // 2)
+    if n <= n_out:
+        return np.flatnonzero(~np.isnan(y))
+
+    size = -(-n // n_buckets)
+    padded = n_buckets * size
+    high = np.full(padded, -np.inf)
+    low = np.full(padded, np.inf)
+    high[:n] = np.where(np.isnan(y), -np.inf, y)
+    low[:n] = np.where(np.isnan(y), np.inf, y)
+    offsets = np.arange(n_buckets) * size
+    argmax = high.reshape(n_buckets, size).argmax(axis=1) + offsets
+    argmin = low.reshape(n_buckets, size).argmin(axis=1) + offsets
+
+    keep = np.concatenate([argmax[np.isfinite(high[argmax])], argmin[np.isfinite(low[argmin])]])
+    return np.unique(keep)
+
+
+def downsample_frame(df, x, columns, budget=DEFAULT_POINT_BUDGET, method='lttb'):
+    """Rows of df to plot so every column fits in roughly `budget` points.
+
+    `method` is 'lttb' for line charts and 'minmax' for bar charts. The
+    budget is split between the columns (they share rows in a wide-form
+    chart). Each column's max/min rows and the first/last row are always
+    kept, so annotated extrema and the trend colouring stay correct.
+    """
+    if budget is None or len(df) <= budget:
+        return df
+
+    x_values = _as_float(df[x].to_numpy())
+    per_column = max(3, budget // len(columns))
+    keep = [np.array([0, len(df) - 1])]
+    for column in columns:
+        y = df[column].to_numpy(dtype='float64', na_value=np.nan)
+        if method == 'minmax':
+            keep.append(minmax_indices(y, per_column))
+        else:
+            keep.append(lttb_indices(x_values, y, per_column))
+        if not np.isnan(y).all():
+            keep.append(np.array([np.nanargmax(y), np.nanargmin(y)]))
+    return df.iloc[np.unique(np.concatenate(keep))]
@@ -0,0 +1,326 @@
+import threading
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# plotly.express (~100 ms) diimpor di dalam fungsi: grafik dari cache atau artefak tidak membutuhkannya
+
+from downsample import downsample_frame
+
+RETAIL = 'retail_and_recreation_percent_change_from_baseline'
+GROCERY = 'grocery_and_pharmacy_percent_change_from_baseline'
+WORKPLACES = 'workplaces_percent_change_from_baseline'
+RESIDENTIAL = 'residential_percent_change_from_baseline'
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _add_overlays(fig, overlay_df, budget=None):
+    """Dashed analytics lines (rolling means, trend, ...) on top of a chart."""
+    if overlay_df is None:
+        return
+    columns = [column for column in overlay_df.columns if column != 'date']
+    chart_df = downsample_frame(overlay_df, 'date', columns, budget, method='lttb')
+    for column in columns:
+        fig.add_scatter(x=chart_df['date'], y=chart_df[column], mode='lines',
+                        line=dict(dash='dash', width=1.5), name=column)
+
+
+def retail_grocery_figure(filtered_df, retail_extrema, grocery_extrema, budget=None, overlays=None):
+    """Line chart of retail vs grocery with their max/min points.
+
+    The extrema tuples are (max, max_date, min, min_date) from the
+    aggregate cube, so they are exact even when the lines are downsampled.
+    `overlays` is an optional wide frame of extra series drawn dashed.
+    """
+    import plotly.express as px
+
+    chart_df = downsample_frame(filtered_df, 'date', [RETAIL, GROCERY], budget, method='lttb')
+
+    # Membuat grafik garis tanpa penanda
+    fig1 = px.line(
+        chart_df,
+        x='date',
+        y=[RETAIL, GROCERY],
+        labels={"value": "% Change", "variable": "Category"},
+        line_shape='linear'  # Menentukan bentuk garis
+    )
+
+    max_value_retail, max_date_retail, min_value_retail, min_date_retail = retail_extrema
+    max_value_grocery, max_date_grocery, min_value_grocery, min_date_grocery = grocery_extrema
+
+    # Menambahkan titik maksimum dan minimum ke grafik
+    fig1.add_scatter(
+        x=[max_date_retail, min_date_retail],
+        y=[max_value_retail, min_value_retail],
+        mode='markers',
+        marker=dict(color='blue', size=10),
+        name='Retail Max/Min Points'
+    )
+
+    fig1.add_scatter(
+        x=[max_date_grocery, min_date_grocery],
+        y=[max_value_grocery, min_value_grocery],
+        mode='markers',
+        marker=dict(color='orange', size=10),
+        name='Grocery Max/Min Points'
+    )
+
+    # Mengubah warna garis berdasarkan perubahan
+    for trace in fig1.data:
+        if trace.name == RETAIL:
+            trace.line.color = 'green' if trace.y[-1] > trace.y[0] else 'red'
+        else:
+            trace.line.color = 'red'  # Warna untuk grocery and pharmacy
+
+    _add_overlays(fig1, overlays, budget)
+    return fig1
+
+
+def workplace_figure(filtered_df, workplace_extrema, budget=None, overlays=None):
+    """Bar chart of workplace mobility with its max/min points (and optional overlay lines)."""
+    import plotly.express as px
+
+    chart_df = downsample_frame(filtered_df, 'date', [WORKPLACES], budget, method='minmax')
+    max_value, max_date, min_value, min_date = workplace_extrema
+
+    # Grafik utama
+    fig2 = px.bar(
+        chart_df,
+        x='date',
+        y=WORKPLACES,
+        color=WORKPLACES,
+        color_continuous_scale="Viridis"
+    )
+
+    # Tambahkan titik maksimum dan minimum
+    fig2.add_scatter(
+        x=[max_date, min_date],
+        y=[max_value, min_value],
+        mode='markers',
+        marker=dict(color='red', size=10),
+        name='Max/Min Points'
+    )
+    _add_overlays(fig2, overlays, budget)
+    return fig2
+
+
+def workplace_change_figure(change_df, title, budget=None):
+    """Bar chart of only the increases (or only the decreases) in workplace mobility."""
+    import plotly.express as px
+
+    chart_df = downsample_frame(change_df, 'date', [WORKPLACES], budget, method='minmax')
+    return px.bar(
+        chart_df,
+        x='date',
+        y=WORKPLACES,
+        color=WORKPLACES,
+        color_continuous_scale="Viridis",
+        title=title
+    )
+
+
+def residential_weekday_figure(daily_avg):
+    """Average residential change per weekday, weekends highlighted."""
+    import plotly.express as px
+
+    daily_avg = daily_avg.copy()
+    daily_avg.index = WEEKDAYS
+
+    # Buat grafik batang dengan penekanan warna
+    fig_bar = px.bar(
+        daily_avg,
+        x=daily_avg.index,
+        y=daily_avg.values,
+        labels={"x": "Day", "y": "Average % Change"},
+        color=daily_avg.values,
+        color_continuous_scale=px.colors.sequential.Reds,  # Menggunakan skala warna merah
+        title="Average Residential Mobility Change by Day"
+    )
+
+    # Soroti akhir pekan dengan warna yang berbeda
+    fig_bar.update_traces(marker_color=["blue"]*5 + ["orange"]*2)  # Warna biru untuk hari kerja, oranye untuk akhir pekan
+    return fig_bar
+
+
+def children_figure(summary, metric, selected=None):
+    """Window mean of one metric per child region, the selected one highlighted."""
+    import plotly.express as px
+
+    level = summary.index.name
+    chart_df = summary.reset_index().sort_values('mean')
+    fig = px.bar(
+        chart_df,
+        x=level,
+        y='mean',
+        hover_data=['count'],
+        labels={level: "Region", 'mean': "Average % Change"},
+        title=metric.replace('_percent_change_from_baseline', '').replace('_', ' ').title()
+    )
+    # Wilayah yang sedang dipilih diberi warna berbeda
+    fig.update_traces(marker_color=['orange' if name == selected else 'steelblue' for name in chart_df[level]])
+    return fig
+
+
+def comparison_figure(wide_df, regions, metric, small_multiples=False, budget=None):
+    """One metric for several regions, overlaid or as small multiples."""
+    import plotly.express as px
+
+    chart_df = downsample_frame(wide_df, 'date', list(regions), budget, method='lttb')
+    long_df = chart_df.melt(id_vars='date', value_vars=list(regions), var_name='region', value_name=metric)
+    facets = dict(facet_col='region', facet_col_wrap=4, facet_row_spacing=0.04) if small_multiples else {}
+    fig = px.line(
+        long_df,
+        x='date',
+        y=metric,
+        color='region',
+        labels={metric: "% Change", 'region': "Region"},
+        **facets
+    )
+    if small_multiples:
+        # Judul tiap panel cukup nama wilayahnya
+        fig.for_each_annotation(lambda annotation: annotation.update(text=annotation.text.split("=")[-1]))
+        fig.update_layout(showlegend=False, height=220 * -(-len(regions) // 4))
+    return fig
+
+
+def choropleth_figure(geojson, codes, names, dates, values, metric):
+    """Province choropleth; several rows of `values` become animation frames.
+
+    The polygons are attached to the figure once. Each frame carries only
+    the new z array, so scrubbing the slider never resends the geometry.
+    """
+    values = np.atleast_2d(values)
+    scale = np.nanmax(np.abs(values)) if np.isfinite(values).any() else 1.0
+    labels = [str(pd.Timestamp(date).date()) for date in dates]
+    fig = go.Figure(go.Choropleth(
+        geojson=geojson,
+        locations=codes,
+        z=values[0],
+        text=names,
+        hovertemplate="%{text}: %{z:.1f}%<extra></extra>",
+        colorscale='RdBu',
+        zmin=-scale,
+        zmax=scale,
+        colorbar=dict(title="% Change"),
+    ))
+    fig.update_geos(fitbounds='locations', visible=False)
+    fig.update_layout(title=metric.replace('_percent_change_from_baseline', '').replace('_', ' ').title(),
+                      margin=dict(l=0, r=0, t=40, b=0), height=520)
+
+    if len(values) > 1:
+        fig.frames = [go.Frame(data=[go.Choropleth(z=row)], name=label) for row, label in zip(values, labels)]
+        fig.update_layout(
+            updatemenus=[dict(type='buttons', showactive=False, x=0, y=0, xanchor='right', yanchor='top', buttons=[
+                dict(label="▶", method='animate',
+                     args=[None, dict(frame=dict(duration=300, redraw=True), fromcurrent=True)]),
+            ])],
+            sliders=[dict(active=0, x=0.05, len=0.95, steps=[
+                dict(label=label, method='animate',
+                     args=[[label], dict(mode='immediate', frame=dict(duration=0, redraw=True))])
+                for label in labels
+            ])],
+        )
+    return fig
+
+
+def decomposition_figure(series_df, budget=None):
+    """Observed, trend, seasonal, residual and week-over-week panels sharing the date axis."""
+    import plotly.express as px
+
+    columns = [column for column in series_df.columns if column != 'date']
+    chart_df = downsample_frame(series_df, 'date', columns, budget, method='lttb')
+    long_df = chart_df.melt(id_vars='date', value_vars=columns, var_name='component', value_name='value')
+    fig = px.line(long_df, x='date', y='value', facet_row='component', color='component',
+                  labels={'value': "", 'date': ""}, height=160 * len(columns))
+    fig.update_yaxes(matches=None)
+    fig.for_each_annotation(lambda annotation: annotation.update(text=annotation.text.split("=")[-1]))
+    fig.update_layout(showlegend=False)
+    return fig
+
+
+def sweep_figure(scores, recommended):
+    """Inertia (elbow) and silhouette against k for every year, recommended k marked."""
+    import plotly.express as px
+
+    fig = make_subplots(rows=1, cols=2, subplot_titles=("Inertia (elbow)", "Silhouette"))
+    colors = px.colors.qualitative.Plotly
+    for i, (year, group) in enumerate(scores.groupby('year')):
+        color = colors[i % len(colors)]
+        elbow, best = recommended[year]
+        for col, column, marked in ((1, 'inertia', elbow), (2, 'silhouette', best)):
+            fig.add_scatter(x=group['k'], y=group[column], mode='lines+markers', line=dict(color=color),
+                            name=str(year), legendgroup=str(year), showlegend=col == 1, row=1, col=col)
+            point = group[group['k'] == marked]
+            fig.add_scatter(x=point['k'], y=point[column], mode='markers', showlegend=False,
+                            marker=dict(color=color, size=14, symbol='star'), row=1, col=col)
+    fig.update_xaxes(title_text="k", dtick=1)
+    return fig
+
+
+def cluster_figure(clustering_df):
+    """Scatter of retail vs workplace change coloured by cluster."""
+    import plotly.express as px
+
+    return px.scatter(
+        clustering_df,
+        x=RETAIL,
+        y=WORKPLACES,
+        color='cluster',
+        labels={
+            RETAIL: 'Retail & Recreation Change (%)',
+            WORKPLACES: 'Workplace Change (%)'
+        },
+        color_continuous_scale='Viridis'
+    )
+
+
+class FigureCache:
+    """Bounded LRU of built figures, shared by every session in the process.
+
+    Entries are keyed by (chart, key) where `key` holds only the inputs
+    that chart depends on, so e.g. changing the clustering year never
+    evicts or rebuilds the mobility charts. Cached figures must be treated
+    as read-only. Per-chart hit/miss/eviction counters are kept for the
+    sidebar and for monitoring.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'evictions': 0})
+
+    def get(self, chart, key, build):
+        """Cached figure for (chart, key), calling build() on a miss."""
+        cache_key = (chart, key)
+        with self._lock:
+            if cache_key in self._figures:
+                self._figures.move_to_end(cache_key)
+                self.stats[chart]['hits'] += 1
+                return self._figures[cache_key]
+            self.stats[chart]['misses'] += 1
+
+        # Dibangun di luar lock agar sesi lain tidak ikut menunggu
+        figure = build()
+        with self._lock:
+            self._figures[cache_key] = figure
+            while len(self._figures) > self.max_entries:
+                (evicted_chart, _), _ = self._figures.popitem(last=False)
+                self.stats[evicted_chart]['evictions'] += 1
+        return figure
+
+    def counters(self):
+        with self._lock:
+            return {chart: dict(counts) for chart, counts in self.stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self.stats.clear()
+
+
+figure_cache = FigureCache()
@@ -0,0 +1,100 @@
+"""Province boundaries for the choropleth, simplified once and cached as GeoJSON.
+
+The source is any file geopandas can read (shapefile, GeoJSON, GeoPackage)
+with one polygon per province, set with DASHBOARD_GEOMETRY or dropped in as
+img/IDN1.shp (GADM level-1 naming). No boundary file ships with the repo
+(img/ only holds part of the country outline, IDN0), so without one the
+dashboard shows a notice in place of the map. Only the province code and simplified,
+rounded coordinates are kept, so the cached file is a small fraction of the
+source and is reused until the source or the tolerance changes.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from data_loader import BASE_DIR, CACHE_DIR
+
+GEOMETRY_PATH = Path(os.environ.get('DASHBOARD_GEOMETRY', BASE_DIR / "img" / "IDN1.shp"))
+# Kolom kode provinsi yang dikenali, dalam urutan prioritas
+KEY_COLUMNS = ('iso_3166_2_code', 'iso_3166_2', 'ISO_1', 'HASC_1')
+SIMPLIFY_TOLERANCE = 0.01  # derajat, sekitar 1 km
+COORDINATE_DECIMALS = 3
+
+
+def _normalize_code(value):
+    # GADM menulis "ID.AC", laporan mobilitas menulis "ID-AC"
+    return str(value).strip().upper().replace('.', '-')
+
+
+def geometry_signature(path=GEOMETRY_PATH, tolerance=SIMPLIFY_TOLERANCE):
+    """(path, mtime, size, tolerance) of the boundary source, or None if it is missing."""
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return (str(path), stat.st_mtime_ns, stat.st_size, tolerance)
+
+
+def _round(coordinates):
+    if isinstance(coordinates[0], (int, float)):
+        return [round(value, COORDINATE_DECIMALS) for value in coordinates]
+    return [_round(part) for part in coordinates]
+
+
+def build_geojson(path, tolerance=SIMPLIFY_TOLERANCE):
+    """Simplified FeatureCollection with the normalized province code as feature id."""
+    import geopandas
+
+    frame = geopandas.read_file(path)
+    key = next((column for column in KEY_COLUMNS if column in frame.columns), None)
+    if key is None:
+        raise ValueError(f"{path} has none of the province code columns {KEY_COLUMNS}")
+    if frame.crs is not None:
+        frame = frame.to_crs(epsg=4326)
+    geometries = frame.geometry.simplify(tolerance, preserve_topology=True)
+
+    features = []
+    for code, geometry in zip(frame[key], geometries):
+        if geometry is None or geometry.is_empty:
+            continue
+        shape = geometry.__geo_interface__
+        features.append({
+            'type': 'Feature',
+            'id': _normalize_code(code),
+            'properties': {},
+            'geometry': {'type': shape['type'], 'coordinates': _round(shape['coordinates'])},
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+@lru_cache(maxsize=1)
+def _load(signature):
+    path, _, _, tolerance = signature
+    version = hashlib.sha1(repr(signature).encode()).hexdigest()[:12]
+    cached = CACHE_DIR / f"geometry-{version}.geojson"
+    if cached.exists():
+        return json.loads(cached.read_text())
+
+    geojson = build_geojson(path, tolerance)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = cached.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(geojson, separators=(',', ':')))
+    os.replace(tmp_path, cached)
+
+    # Buang cache versi lama
+    for stale in CACHE_DIR.glob("geometry-*.geojson"):
+        if stale != cached:
+            stale.unlink(missing_ok=True)
+    return geojson
+
+
+def get_province_geojson():
+    """Cached simplified province GeoJSON, or None when no boundary file is available."""
+    signature = geometry_signature()
+    # geopandas opsional (dan lambat diimpor): hanya dicek ada, diimpor saat batas perlu dibangun
+    if signature is None or importlib.util.find_spec('geopandas') is None:
+        return None
+    return _load(signature)
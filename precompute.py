@@ -0,0 +1,160 @@
+"""Build every artifact the dashboard needs in one batch run.
+
+Run from the repository root (e.g. after adding a report to dataset/):
+
+    python precompute.py [--workers N] [--point-budget 500]
+
+Syncs the columnar store, builds the hierarchy index, the aggregate cube
+and the region tensor, fits the cluster models of every year and engine,
+and serializes the default mobility charts (full date range, default point
+budget, no overlays) of every region. Seasonal analytics are not stored:
+the dashboard derives them per viewed region (see timeseries.py). Cluster fits run on a process pool while this process
+builds the objects and pickles them; the chart batches then run on the
+same pool and load the index and cube from that pickle instead of
+rebuilding them. Objects and charts land in cache/artifacts/<version>/
+(see artifacts.py) with a manifest written last, after which the
+dashboard only loads what is there; older artifact versions are removed.
+The columnar parts stay in cache/parts/ and the cluster models in
+cache/clusters/, which keep their own keys and are only brought up to date
+here.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from aggregates import get_aggregate_cube
+from artifacts import ARTIFACTS_DIR, MANIFEST, OBJECTS, artifact_dir, artifact_version, chart_name, staged_objects
+from charts import region_charts
+from cluster_sweep import worker_count
+from clustering import ENGINES, FEATURES, N_CLUSTERS, get_clustering
+from comparison import get_region_tensor
+from data_loader import dataset_signature, dataset_version, load_mobility_data, sync_columnar_store
+from downsample import DEFAULT_POINT_BUDGET
+from geometry import get_province_geojson
+from region_index import get_hierarchy_index
+
+
+def _chart_batch(directory, version, regions, start_date, end_date, point_budget):
+    """Worker: write the default charts of `regions`; returns (charts, bytes, seconds)."""
+    start = time.perf_counter()
+    # Index dan cube dibaca dari objects.pkl yang sudah ditulis induk, bukan dibangun ulang per worker
+    objects = staged_objects(directory)
+    index, cube = objects['hierarchy_index'], objects['aggregate_cube']
+    count = size = 0
+    for region in regions:
+        for chart, (key, build) in region_charts(index, cube, version, region, start_date, end_date,
+                                                 point_budget).items():
+            text = build().to_json()
+            (directory / "charts" / chart_name(chart, key)).write_text(text)
+            count += 1
+            size += len(text)
+    return count, size, time.perf_counter() - start
+
+
+def _cluster_year(year, engine):
+    """Worker: fit (or find on disk) the model of one year; returns (rows, seconds)."""
+    start = time.perf_counter()
+    rows, _, _ = get_clustering(year, FEATURES, n_clusters=N_CLUSTERS, engine=engine)
+    return (0 if rows is None else len(rows)), time.perf_counter() - start
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def build(workers, point_budget):
+    """Build the artifact directory of the current data; returns its manifest."""
+    started = time.perf_counter()
+    summary = {}
+
+    signature = dataset_signature()
+    parts, seconds = _timed(lambda: sync_columnar_store(signature))
+    df = load_mobility_data()
+    summary['dataset'] = {'seconds': seconds, 'detail': f"{len(df):,} rows in {len(parts)} parts"}
+
+    directory = artifact_dir(signature)
+    if directory.exists():
+        shutil.rmtree(directory)
+    (directory / "charts").mkdir(parents=True)
+
+    index, seconds = _timed(get_hierarchy_index)
+    summary['hierarchy_index'] = {'seconds': seconds, 'detail': f"{len(index.paths)} regions"}
+    regions = [path for path in index.paths if path]
+    start_date, end_date = df['date'].min().date(), df['date'].max().date()
+    years = sorted(int(year) for year in df['year'].unique())
+
+    # spawn: worker mulai bersih, tanpa state OpenMP/thread dari proses ini
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        cluster_jobs = {(year, engine): pool.submit(_cluster_year, year, engine)
+                        for year in years for engine in ENGINES}
+
+        # Sementara pool mem-fit model, objek dibangun di proses ini
+        objects = {'hierarchy_index': index}
+        objects['aggregate_cube'], seconds = _timed(get_aggregate_cube)
+        summary['aggregate_cube'] = {'seconds': seconds, 'detail': ""}
+        objects['region_tensor'], seconds = _timed(get_region_tensor)
+        summary['region_tensor'] = {'seconds': seconds, 'detail': f"{len(objects['region_tensor'].regions)} regions"}
+        geojson, seconds = _timed(get_province_geojson)
+        summary['geometry'] = {'seconds': seconds,
+                               'detail': "no boundary file" if geojson is None else f"{len(geojson['features'])} features"}
+
+        _, seconds = _timed(lambda: (directory / OBJECTS).write_bytes(
+            pickle.dumps(objects, protocol=pickle.HIGHEST_PROTOCOL)))
+        summary['objects'] = {'seconds': seconds, 'detail': f"{(directory / OBJECTS).stat().st_size / 1e6:.1f} MB"}
+
+        batches = [regions[i::workers] for i in range(workers)]
+        version = dataset_version(signature)
+        chart_jobs = [pool.submit(_chart_batch, directory, version, batch, start_date, end_date, point_budget)
+                      for batch in batches if batch]
+
+        for (year, engine), job in cluster_jobs.items():
+            rows, seconds = job.result()
+            summary[f'clusters:{year}:{engine}'] = {'seconds': seconds, 'detail': f"{rows:,} rows, k={N_CLUSTERS}"}
+        results = [job.result() for job in chart_jobs]
+        summary['charts'] = {'seconds': sum(seconds for _, _, seconds in results),
+                             'detail': f"{sum(count for count, _, _ in results)} charts, "
+                                       f"{sum(size for _, size, _ in results) / 1e6:.1f} MB"}
+
+    manifest = {
+        'version': artifact_version(signature),
+        'built_at': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'workers': workers,
+        'wall_seconds': time.perf_counter() - started,
+        'date_range': [str(start_date), str(end_date)],
+        'point_budget': point_budget,
+        'artifacts': summary,
+    }
+    # Manifest ditulis terakhir: tanpa manifest direktori dianggap belum lengkap
+    tmp_path = directory / f"{MANIFEST}.{os.getpid()}.tmp"
+    tmp_path.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp_path, directory / MANIFEST)
+
+    for stale in ARTIFACTS_DIR.iterdir():
+        if stale != directory and stale.is_dir():
+            shutil.rmtree(stale, ignore_errors=True)
+    return manifest
+
+
+def print_summary(manifest):
+    print(f"artifacts {manifest['version']} ({manifest['workers']} workers)")
+    for name, entry in manifest['artifacts'].items():
+        print(f"{name:>36} {entry['seconds'] * 1000:9.1f} ms  {entry['detail']}")
+    print(f"{'wall time':>36} {manifest['wall_seconds'] * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=worker_count())
+    parser.add_argument("--point-budget", type=int, default=DEFAULT_POINT_BUDGET)
+    args = parser.parse_args()
+    print_summary(build(max(1, args.workers), args.point_budget))
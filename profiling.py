@@ -0,0 +1,190 @@
+"""Lightweight per-stage profiling for the dashboard.
+
+Disabled (the default) a stage is a shared no-op context manager, so the
+instrumentation costs one method call. Enabled with DASHBOARD_PROFILE=1
+(or ?profile=1 in the URL), every stage records wall time and an optional
+row count. Records are appended to metrics/profile.jsonl, and running
+totals per stage are rewritten to metrics/dashboard.prom in Prometheus
+text format for a local node-exporter textfile collector or curl.
+
+Memory is traced only when the process is started with
+DASHBOARD_PROFILE_MEMORY=1; a URL parameter never turns on tracemalloc.
+tracemalloc is process-wide, so it runs only while a top-level stage is
+open (and is stopped after the last one), and the allocation delta and
+peak are recorded for top-level stages only, and only when no other
+session's stage overlapped them. Nested stages and overlapping stages
+leave both at None.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+METRICS_DIR = Path(__file__).resolve().parent / "metrics"
+PROFILE_ENABLED = os.environ.get('DASHBOARD_PROFILE') == '1'
+TRACE_MEMORY = os.environ.get('DASHBOARD_PROFILE_MEMORY') == '1'
+
+_totals = {}
+_totals_lock = threading.Lock()
+
+# Kedalaman stage per thread (satu sesi Streamlit = satu thread skrip)
+_depth = threading.local()
+# Stage tingkat atas yang sedang melacak memori, di semua sesi
+_tracing_lock = threading.Lock()
+_tracing = {'active': 0, 'entered': 0, 'owned': False}
+
+
+def _begin_tracing():
+    """Register one traced top-level stage; returns (exclusive, entry number)."""
+    with _tracing_lock:
+        exclusive = _tracing['active'] == 0
+        if exclusive:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracing['owned'] = True
+            tracemalloc.reset_peak()
+        _tracing['active'] += 1
+        _tracing['entered'] += 1
+        return exclusive, _tracing['entered']
+
+
+def _end_tracing(exclusive, entered):
+    """Unregister a traced stage; returns (current, peak) if nothing overlapped it, else None."""
+    with _tracing_lock:
+        measured = tracemalloc.get_traced_memory() if exclusive and _tracing['entered'] == entered else None
+        _tracing['active'] -= 1
+        if _tracing['active'] == 0 and _tracing['owned']:
+            tracemalloc.stop()
+            _tracing['owned'] = False
+        return measured
+
+
+class StageRecord:
+    __slots__ = ('name', 'seconds', 'alloc_delta_bytes', 'peak_bytes', 'rows')
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.seconds = 0.0
+        self.alloc_delta_bytes = None
+        self.peak_bytes = None
+        self.rows = rows
+
+    def as_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class _NullStage:
+    # Satu objek bersama; mengisi .rows di sini tidak berpengaruh apa-apa
+    record = StageRecord('disabled')
+
+    def __enter__(self):
+        return self.record
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('profiler', 'record', 'start', 'tracing', 'alloc_start')
+
+    def __init__(self, profiler, name, rows):
+        self.profiler = profiler
+        self.record = StageRecord(name, rows)
+        self.tracing = None
+
+    def __enter__(self):
+        depth = getattr(_depth, 'value', 0)
+        _depth.value = depth + 1
+        if self.profiler.trace_memory and depth == 0:
+            self.tracing = _begin_tracing()
+            self.alloc_start = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc):
+        self.record.seconds = time.perf_counter() - self.start
+        _depth.value -= 1
+        if self.tracing is not None:
+            measured = _end_tracing(*self.tracing)
+            if measured is not None:
+                current, peak = measured
+                self.record.alloc_delta_bytes = current - self.alloc_start
+                self.record.peak_bytes = max(0, peak - self.alloc_start)
+        self.profiler.records.append(self.record)
+        return False
+
+
+class Profiler:
+    """Stage timer for one script run (or one fragment rerun)."""
+
+    def __init__(self, enabled=PROFILE_ENABLED, output_dir=METRICS_DIR, trace_memory=TRACE_MEMORY):
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.trace_memory = enabled and trace_memory
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records = []
+        self._flushed = 0
+
+    def stage(self, name, rows=None):
+        """Context manager timing `name`; set `.rows` on the yielded record if known."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, rows)
+
+    def summary(self):
+        """Records of this run as plain dicts, in completion order."""
+        return [record.as_dict() for record in self.records]
+
+    def flush(self):
+        """Append new records to the JSON lines file and rewrite the Prometheus file."""
+        if not self.enabled or self._flushed == len(self.records):
+            return
+        new_records = self.records[self._flushed:]
+        self._flushed = len(self.records)
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = time.time()
+        with open(self.output_dir / "profile.jsonl", "a") as handle:
+            for record in new_records:
+                handle.write(json.dumps({'ts': timestamp, 'run_id': self.run_id, **record.as_dict()}) + "\n")
+
+        with _totals_lock:
+            for record in new_records:
+                totals = _totals.setdefault(record.name, {'calls': 0, 'seconds': 0.0})
+                totals['calls'] += 1
+                totals['seconds'] += record.seconds
+                totals['last_seconds'] = record.seconds
+                totals['last_alloc_bytes'] = record.alloc_delta_bytes
+                totals['last_peak_bytes'] = record.peak_bytes
+                totals['last_rows'] = record.rows
+            text = prometheus_text(_totals)
+
+        path = self.output_dir / "dashboard.prom"
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(text)
+        os.replace(tmp_path, path)
+
+
+def prometheus_text(totals):
+    metrics = [
+        ('dashboard_stage_calls_total', 'counter', 'Number of times each stage ran.', 'calls'),
+        ('dashboard_stage_seconds_total', 'counter', 'Total wall time spent in each stage.', 'seconds'),
+        ('dashboard_stage_last_seconds', 'gauge', 'Wall time of the latest run of each stage.', 'last_seconds'),
+        ('dashboard_stage_last_alloc_bytes', 'gauge', 'Net traced allocations of the latest run.', 'last_alloc_bytes'),
+        ('dashboard_stage_last_peak_bytes', 'gauge', 'Peak traced allocations of the latest run.', 'last_peak_bytes'),
+        ('dashboard_stage_last_rows', 'gauge', 'Rows handled by the latest run of each stage.', 'last_rows'),
+    ]
+    lines = []
+    for metric, kind, help_text, field in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for stage, values in sorted(totals.items()):
+            if values.get(field) is not None:
+                lines.append(f'{metric}{{stage="{stage}"}} {values[field]}')
+    return "\n".join(lines) + "\n"
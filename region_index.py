@@ -0,0 +1,284 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from artifacts import load_artifact
+from data_loader import (METRICS, dataset_signature, feather, load_mobility_data, part_fingerprints,
+                         read_columnar, sync_columnar_store)
+
+# Tingkat wilayah dari atas ke bawah: provinsi -> kabupaten/kota
+LEVELS = ('sub_region_1', 'sub_region_2')
+# Segmen terbanyak dalam satu IndexChain; sesudahnya index dibangun ulang penuh
+MAX_SEGMENTS = 8
+
+
+def _day_keys(node_ids, dates):
+    """One sortable int64 per row: node id in the high bits, day number in the low bits."""
+    days = np.asarray(dates).astype('datetime64[D]').astype(np.int64) + 2 ** 31
+    return (np.asarray(node_ids, dtype=np.int64) << 32) | days
+
+
+class HierarchyIndex:
+    """Country -> province -> sub-region tree over one (node, date)-sorted frame.
+
+    Every node is a path tuple: () for the country rows, then (province,)
+    and (province, sub_region_2). Nodes are numbered in path order, so a
+    parent comes right before its subtree and its children are consecutive
+    blocks; a date window over all children is one vectorized searchsorted.
+    Region names stay categorical codes until a block is labelled, so a long
+    tail of sub-regions costs a few integers per row rather than a string
+    or a frame per node.
+
+    A parent without rows of its own (only its children are reported) gets
+    rollup rows: the per-date unweighted mean of its children. Those paths
+    are listed in `rollups`.
+    """
+
+    def __init__(self, df, levels=LEVELS):
+        self.levels = tuple(level for level in levels if level in df.columns)
+        df, self.rollups = self._with_rollups(df)
+
+        codes, names = self._level_codes(df)
+        dims = [len(level_names) + 1 for level_names in names]
+        keys, node_ids = np.unique(np.ravel_multi_index(codes, dims), return_inverse=True)
+        self.paths = []
+        for path_codes in zip(*np.unravel_index(keys, dims)):
+            self.paths.append(tuple(names[depth][code - 1] for depth, code in enumerate(path_codes) if code))
+        sorted_ids = self._partition(df, node_ids, dict(enumerate(self.paths)))
+        self._keys = _day_keys(sorted_ids, self.dates)
+        self._node_ids = {path: node_id for node_id, path in enumerate(self.paths)}
+
+        self.children = {}
+        for path in self.paths:
+            if path:
+                self.children.setdefault(path[:-1], []).append(path)
+
+        # Urutan kemunculan pertama provinsi, sama seperti df['sub_region_1'].dropna().unique()
+        top = codes[0]
+        self.regions = [names[0][code - 1] for code in pd.unique(top[top > 0])]
+
+    def _partition(self, df, codes, keys):
+        """Sort rows by (code, date) and map keys[code] to its [start, stop) block."""
+        # lexsort bersifat stabil, jadi urutan asli baris dalam satu tanggal tetap
+        order = np.lexsort((df['date'].to_numpy(), codes))
+        self.frame = df.iloc[order]
+        self.dates = self.frame['date'].to_numpy()
+
+        sorted_codes = codes[order]
+        boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+        starts = np.concatenate(([0], boundaries))
+        stops = np.concatenate((boundaries, [len(sorted_codes)]))
+        self.blocks = {}
+        for start, stop in zip(starts, stops):
+            code = sorted_codes[start]
+            if code in keys:
+                self.blocks[keys[code]] = (start, stop)
+        return sorted_codes
+
+    def __len__(self):
+        return len(self.frame)
+
+    def bounds(self, region, start_date, end_date):
+        """Positional [lo, hi) bounds of region rows within the date range."""
+        if region not in self.blocks:
+            return 0, 0
+        start, stop = self.blocks[region]
+        dates = self.dates[start:stop]
+        lo = start + np.searchsorted(dates, pd.Timestamp(start_date).to_datetime64(), side='left')
+        hi = start + np.searchsorted(dates, pd.Timestamp(end_date).to_datetime64(), side='right')
+        return lo, max(lo, hi)
+
+    def query(self, region, start_date, end_date):
+        """Rows of `region` with start_date <= date <= end_date."""
+        lo, hi = self.bounds(region, start_date, end_date)
+        return self.frame.iloc[lo:hi]
+
+    def increases(self, region, start_date, end_date, metric):
+        window = self.query(region, start_date, end_date)
+        return window[window[metric] > 0]
+
+    def decreases(self, region, start_date, end_date, metric):
+        window = self.query(region, start_date, end_date)
+        return window[window[metric] < 0]
+
+    def _level_codes(self, df):
+        """Per-level category codes shifted by one (0 = empty level) and category names."""
+        codes, names = [], []
+        for level in self.levels:
+            column = df[level]
+            if not isinstance(column.dtype, pd.CategoricalDtype):
+                column = column.astype('category')
+            codes.append(column.cat.codes.to_numpy().astype(np.int64) + 1)
+            names.append(column.cat.categories)
+        return codes, names
+
+    def _with_rollups(self, df):
+        """Add mean-of-children rows for every parent that has none of its own."""
+        rollups = []
+        metrics = [metric for metric in METRICS if metric in df.columns]
+        # Dari tingkat terdalam ke atas, jadi rollup bisa digulung lagi ke tingkat berikutnya
+        for depth in reversed(range(len(self.levels))):
+            codes, names = self._level_codes(df)
+            row_depth = (np.stack(codes) > 0).sum(axis=0)
+            child_rows = row_depth == depth + 1
+            if not child_rows.any():
+                continue
+            dims = [len(level_names) + 1 for level_names in names[:depth]]
+            parent = np.ravel_multi_index(codes[:depth], dims) if depth else np.zeros(len(df), dtype=np.int64)
+            wanted = np.setdiff1d(parent[child_rows], parent[row_depth == depth])
+            if not len(wanted):
+                continue
+
+            children = df[child_rows & np.isin(parent, wanted)]
+            group_keys = list(self.levels[:depth]) + ['date']
+            aggregations = {metric: 'mean' for metric in metrics}
+            aggregations.update({column: 'first' for column in ('country_region_code', 'country_region', 'year')
+                                 if column in df.columns and column not in group_keys})
+            rolled = children.groupby(group_keys, observed=True, sort=False).agg(aggregations).reset_index()
+            # Kolom lain (sub-wilayah, kode ISO, place_id) tidak berlaku untuk baris rollup
+            for column in df.columns.difference(rolled.columns):
+                rolled[column] = pd.Series(pd.NA, index=rolled.index, dtype=df[column].dtype)
+            df = pd.concat([df, rolled[df.columns]], ignore_index=True)
+
+            parent_codes = np.unravel_index(wanted, dims) if depth else ()
+            for path_codes in zip(*parent_codes) if depth else [()]:
+                rollups.append(tuple(names[level][code - 1] for level, code in enumerate(path_codes)))
+        return df, rollups
+
+    def child_bounds(self, path, start_date, end_date):
+        """(child paths, lo, hi): positional window bounds of every child of `path`."""
+        children = self.children.get(path, [])
+        node_ids = np.array([self._node_ids[child] for child in children], dtype=np.int64)
+        start = pd.Timestamp(start_date).to_datetime64()
+        end = pd.Timestamp(end_date).to_datetime64()
+        lo = np.searchsorted(self._keys, _day_keys(node_ids, np.full(len(node_ids), start)), side='left')
+        hi = np.searchsorted(self._keys, _day_keys(node_ids, np.full(len(node_ids), end)), side='right')
+        return children, lo, np.maximum(lo, hi)
+
+
+class IndexChain:
+    """A HierarchyIndex followed by the indexes of rows appended after it.
+
+    Every segment is a HierarchyIndex over rows dated after all rows of the
+    segments before it, with no node and no rollup the first segment does
+    not have (extend_index checks this). A node's rows in date order are
+    therefore its blocks in segment order, and queries give exactly what
+    one index over all the rows would, row labels included.
+    """
+
+    def __init__(self, segments):
+        self.segments = list(segments)
+        first = self.segments[0]
+        self.levels, self.paths, self.children = first.levels, first.paths, first.children
+        self.regions, self.rollups = first.regions, first.rollups
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    def query(self, region, start_date, end_date):
+        """Rows of `region` with start_date <= date <= end_date, from every segment."""
+        windows = [segment.query(region, start_date, end_date) for segment in self.segments]
+        found = [window for window in windows if len(window)]
+        if len(found) > 1:
+            return pd.concat(found)
+        return found[0] if found else windows[0]
+
+    increases = HierarchyIndex.increases
+    decreases = HierarchyIndex.decreases
+
+
+def segments(index):
+    """The HierarchyIndex segments of an index or an IndexChain, oldest first."""
+    return getattr(index, 'segments', [index])
+
+
+def _aligned(frame, like):
+    """`frame` with the column dtypes of `like`, or None where its values would not fit them."""
+    if list(frame.columns) != list(like.columns):
+        return None
+    changed = {}
+    for column in frame.columns:
+        dtype, target = frame[column].dtype, like[column].dtype
+        if dtype == target:
+            continue
+        if isinstance(target, pd.CategoricalDtype):
+            if (not isinstance(dtype, pd.CategoricalDtype)
+                    or not set(dtype.categories) <= set(target.categories)):
+                return None
+            changed[column] = frame[column].cat.set_categories(target.categories)
+            continue
+        try:
+            fits = np.can_cast(getattr(dtype, 'numpy_dtype', dtype), getattr(target, 'numpy_dtype', target))
+        except TypeError:
+            fits = False
+        if not fits:
+            return None
+        changed[column] = frame[column].astype(target)
+    return frame.assign(**changed) if changed else frame
+
+
+def extend_index(index, frame):
+    """`index` plus a segment over `frame`, rows appended after it; None if a full rebuild is needed.
+
+    The new segment is indexed on its own, so the cost follows the
+    appended rows, not the history. That only gives the same answers as
+    a full rebuild when the new rows all come after the indexed dates, add
+    no region and keep every rollup a rollup; anything else (or more than
+    MAX_SEGMENTS segments) returns None.
+    """
+    current = segments(index)
+    if frame.empty or len(current) >= MAX_SEGMENTS or frame['date'].min() <= current[-1].dates.max():
+        return None
+    frame = _aligned(frame, current[0].frame)
+    if frame is None:
+        return None
+    segment = HierarchyIndex(frame, current[0].levels)
+    paths, rollups = set(segment.paths), set(segment.rollups)
+    if not paths <= set(index.paths) or not rollups <= set(index.rollups) or (paths - rollups) & set(index.rollups):
+        return None
+    # Label baris melanjutkan segmen sebelumnya, jadi hasil query gabungan tetap berlabel unik
+    segment.frame.index = segment.frame.index + max(part.frame.index.max() for part in current) + 1
+    return IndexChain(current + [segment])
+
+
+# Index terakhir yang dibangun di proses ini, titik awal untuk versi data berikutnya
+_latest = {}
+
+
+def _appended(previous, paths):
+    """`previous` extended with the parts in `paths` it was not built from, or None."""
+    parts = part_fingerprints(paths)
+    built_from = getattr(previous, 'parts', None)
+    if built_from is None or not set(built_from) <= set(parts):
+        return None
+    if set(built_from) == set(parts):
+        return previous
+    new = [path for path, part in zip(paths, parts) if part not in set(built_from)]
+    index = extend_index(previous, read_columnar(new))
+    if index is not None:
+        index.parts = parts
+    return index
+
+
+@lru_cache(maxsize=1)
+def _build_hierarchy(signature):
+    index = load_artifact('hierarchy_index', signature)
+    if index is None:
+        paths = sync_columnar_store(signature) if feather is not None else None
+        if paths is not None and _latest.get('index') is not None:
+            index = _appended(_latest['index'], paths)
+        if index is None:
+            index = HierarchyIndex(load_mobility_data())
+            index.parts = part_fingerprints(paths) if paths is not None else None
+    _latest['index'] = index
+    return index
+
+
+def get_hierarchy_index():
+    """HierarchyIndex (or IndexChain) over the current dataset, built once per dataset version.
+
+    After a report grows, the previous version is extended with the new
+    parts instead of being rebuilt (see extend_index).
+    """
+    return _build_hierarchy(dataset_signature())
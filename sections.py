@@ -0,0 +1,49 @@
+"""Dashboard sections and the inputs each one depends on.
+
+Sidebar filters and the language toggle are global, so changing them
+reruns the whole page (unchanged charts come straight from the figure
+cache). Widgets listed in SECTION_WIDGETS live inside their section:
+dashboard.py makes exactly those sections Streamlit fragments, so changing
+one of their widgets reruns only that section. Every widget inside a
+section takes its key from widget_key(), which refuses widgets that are
+not declared here.
+"""
+
+SECTION_INPUTS = {
+    'header': ('language', 'region', 'date_range'),
+    'retail_grocery': ('language', 'region', 'date_range', 'point_budget', 'overlays'),
+    'workplace': ('language', 'region', 'date_range', 'point_budget', 'overlays'),
+    'residential': ('language', 'region', 'date_range'),
+    'seasonality': ('language', 'region', 'date_range', 'point_budget'),
+    'drilldown': ('language', 'region', 'date_range'),
+    'comparison': ('language', 'date_range', 'point_budget'),
+    'map': ('language', 'date_range'),
+    'clustering': ('language',),
+    'cluster_sweep': ('language',),
+}
+
+SECTION_WIDGETS = {
+    'seasonality': ('seasonality_metric',),
+    'drilldown': ('drilldown_metric',),
+    'comparison': ('comparison_regions', 'comparison_all', 'comparison_metric', 'comparison_layout'),
+    'map': ('map_metric', 'map_view'),
+    'clustering': ('cluster_year', 'cluster_engine'),
+    'cluster_sweep': ('sweep_run', 'sweep_cancel', 'sweep_scope', 'transition_k'),
+}
+
+
+def is_fragment(section):
+    """Whether `section` reruns on its own, i.e. has widgets of its own."""
+    return bool(SECTION_WIDGETS.get(section))
+
+
+def widget_key(section, name):
+    """Key of widget `name` inside `section`; it must be declared in SECTION_WIDGETS."""
+    if name not in SECTION_WIDGETS.get(section, ()):
+        raise KeyError(f"widget {name!r} of section {section!r} is not declared in SECTION_WIDGETS")
+    return name
+
+
+def section_args(section, inputs):
+    """Pick the declared inputs of `section` out of all current inputs."""
+    return {name: inputs[name] for name in SECTION_INPUTS[section]}
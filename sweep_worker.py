@@ -0,0 +1,61 @@
+"""Pool worker side of the k sweep (see cluster_sweep.py).
+
+Workers attach once to the shared-memory block written by the sweep
+process: the standardised matrix followed by one cancel byte. Each task
+fits every k of one scope from its slice and checks the cancel byte
+before every k, so a cancelled sweep stops within one fit.
+"""
+import numpy as np
+
+from clustering import RANDOM_STATE
+
+SILHOUETTE_SAMPLE = 2000
+
+_shared = {}
+
+
+def shared_views(buffer, shape):
+    """(matrix, cancel flag) views over a block of `block_size(shape)` bytes."""
+    matrix = np.ndarray(shape, dtype='float64', buffer=buffer)
+    cancel = np.ndarray((1,), dtype=np.uint8, buffer=buffer, offset=matrix.nbytes)
+    return matrix, cancel
+
+
+def block_size(shape):
+    return int(np.prod(shape)) * 8 + 1
+
+
+def attach(name, shape):
+    """Pool initializer: map the shared block once per worker."""
+    from multiprocessing import shared_memory
+
+    # Worker hasil spawn memakai resource tracker milik induk, jadi hanya induk yang menghapus blok ini
+    try:
+        block = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 tidak punya track=
+        block = shared_memory.SharedMemory(name=name)
+    _shared['block'] = block
+    _shared['matrix'], _shared['cancel'] = shared_views(block.buf, shape)
+
+
+def fit_scope(lo, hi, k_values, keep_labels):
+    """Fit every k on rows [lo, hi) of the shared matrix; returns one score dict per k."""
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+
+    X = _shared['matrix'][lo:hi]
+    scores = []
+    for k in k_values:
+        if k >= len(X) or _shared['cancel'][0]:
+            break
+        kmeans = KMeans(n_clusters=k, random_state=RANDOM_STATE).fit(X)
+        labels = kmeans.labels_
+        silhouette = (silhouette_score(X, labels, sample_size=min(SILHOUETTE_SAMPLE, len(X)),
+                                       random_state=RANDOM_STATE)
+                      if len(np.unique(labels)) > 1 else np.nan)
+        score = {'k': k, 'inertia': float(kmeans.inertia_), 'silhouette': float(silhouette), 'rows': int(hi - lo)}
+        if keep_labels:
+            score['labels'] = labels.astype(np.int8)
+            score['centroids'] = kmeans.cluster_centers_
+        scores.append(score)
+    return scores
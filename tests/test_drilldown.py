@@ -0,0 +1,85 @@
+"""The dashboard with sub-region (sub_region_2) data: a province picked with "All".
+
+The bundled reports have no sub-region rows, so the test copies the
+dashboard modules next to a synthetic report in which one province has its
+own rows plus two sub-regions and another is reported only through its
+sub-regions (a rollup). The script runs in a child process so the copy's
+dataset/ and cache/ are the ones used.
+"""
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('streamlit.testing.v1')
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+REPORT = BASE_DIR / "dataset" / "2022_ID_Region_Mobility_Report.csv"
+METRIC_COLUMNS = [column for column in pd.read_csv(REPORT, nrows=0).columns if column.endswith('_baseline')]
+
+CHILD = r"""
+import json, sys
+from streamlit.testing.v1 import AppTest
+
+results = {}
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+at.run()
+for province in sys.argv[2:]:
+    region = next(box for box in at.selectbox if box.label.startswith("Select Region"))
+    region.select(province).run()
+    sub_region = next(box for box in at.selectbox if box.label.startswith("Select Sub-region"))
+    results[province] = {
+        'sub_regions': list(sub_region.options),
+        'selected': sub_region.value,
+        'exceptions': [str(e.value) for e in at.exception],
+        'headers': [h.value for h in at.header],
+    }
+print(json.dumps(results))
+"""
+
+
+def _synthetic_report():
+    """(report, province with own rows, rollup-only province)."""
+    report = pd.read_csv(REPORT)
+    provinces = report['sub_region_1'].dropna().unique()
+    own, rollup = provinces[0], provinces[1]
+    frames = [report[report['sub_region_1'] != rollup]]
+    for province, names in ((own, ("Kota A", "Kota B")), (rollup, ("Kab X", "Kab Y"))):
+        rows = report[report['sub_region_1'] == province]
+        for offset, name in enumerate(names, start=1):
+            child = rows.copy()
+            child['sub_region_2'] = f"{province} {name}"
+            child[METRIC_COLUMNS] = child[METRIC_COLUMNS] + offset
+            frames.append(child)
+    return pd.concat(frames, ignore_index=True), own, rollup
+
+
+@pytest.fixture(scope='module')
+def drilldown_results(tmp_path_factory):
+    root = tmp_path_factory.mktemp("dashboard")
+    for path in BASE_DIR.glob("*.py"):
+        shutil.copy(path, root / path.name)
+    (root / "dataset").mkdir()
+    report, own, rollup = _synthetic_report()
+    report.to_csv(root / "dataset" / REPORT.name, index=False)
+
+    process = subprocess.run([sys.executable, "-c", CHILD, str(root / "dashboard.py"), own, rollup],
+                             capture_output=True, text=True, cwd=root, timeout=600)
+    assert process.returncode == 0, process.stderr[-2000:]
+    return json.loads(process.stdout.strip().splitlines()[-1]), own, rollup
+
+
+@pytest.mark.parametrize('kind', ['own', 'rollup'])
+def test_province_with_sub_regions_and_all(drilldown_results, kind):
+    results, own, rollup = drilldown_results
+    province = own if kind == 'own' else rollup
+    result = results[province]
+    assert result['selected'] == "All"
+    assert len(result['sub_regions']) == 3
+    assert result['exceptions'] == []
+    # Section sesudah drill-down juga tampil (tidak tertahan di "Loading...")
+    assert "Clusters Analysis" in " ".join(result['headers'])
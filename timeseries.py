@@ -0,0 +1,181 @@
+"""Rolling, weekday-adjusted and seasonal views of a region's daily series.
+
+All kernels work on a dense date x column matrix (NaN where there is no
+report for a date), so each statistic is a handful of whole-array
+operations instead of a groupby-rolling:
+
+- rolling means come from cumulative sums along the date axis;
+- the weekday profile is a (7 x date) indicator matrix times the data;
+- the seasonal decomposition is the classical additive one with a 7-day
+  period (centred moving-average trend, mean detrended value per weekday
+  as the seasonal part, the rest as residual).
+
+Only the series of nodes that are actually shown are built: the first
+request for a node derives all of its series from its rows in the
+hierarchy index, and a bounded LRU per metric keeps the recent ones.
+"""
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from data_loader import dataset_signature
+from region_index import get_hierarchy_index
+
+ROLLING_WINDOWS = (7, 14, 28)
+PERIOD = 7
+# Banyak node (wilayah) yang seri turunannya disimpan per metrik
+MAX_NODES = 64
+
+# Label di dashboard -> nama seri
+OVERLAYS = {
+    "7-day mean": 'rolling_7',
+    "14-day mean": 'rolling_14',
+    "28-day mean": 'rolling_28',
+    "Weekday-adjusted": 'weekday_adjusted',
+    "Trend": 'trend',
+}
+
+
+def _cumulative(values):
+    valid = ~np.isnan(values)
+    sums = np.zeros((len(values) + 1,) + values.shape[1:])
+    np.cumsum(np.where(valid, values, 0.0), axis=0, out=sums[1:])
+    counts = np.zeros(sums.shape, dtype=np.int64)
+    np.cumsum(valid, axis=0, out=counts[1:])
+    return sums, counts
+
+
+def rolling_mean(values, window, min_periods=1):
+    """Trailing mean per column, like DataFrame.rolling(window, min_periods).mean()."""
+    sums, counts = _cumulative(values)
+    hi = np.arange(1, len(values) + 1)
+    lo = np.maximum(hi - window, 0)
+    total = sums[hi] - sums[lo]
+    count = counts[hi] - counts[lo]
+    return np.divide(total, count, out=np.full(total.shape, np.nan), where=count >= min_periods)
+
+
+def centered_mean(values, window):
+    """Centred moving average of an odd window; NaN where the window is not full."""
+    sums, counts = _cumulative(values)
+    half = window // 2
+    centre = np.arange(len(values))
+    lo, hi = centre - half, centre + half + 1
+    inside = (lo >= 0) & (hi <= len(values))
+    lo, hi = np.clip(lo, 0, len(values)), np.clip(hi, 0, len(values))
+    total = sums[hi] - sums[lo]
+    count = counts[hi] - counts[lo]
+    full = inside[:, None] & (count == window)
+    return np.divide(total, count, out=np.full(total.shape, np.nan), where=full)
+
+
+def weekday_profile(values, weekdays):
+    """Mean per weekday (7 x column), ignoring NaN."""
+    indicator = (weekdays[None, :] == np.arange(7)[:, None]).astype('float64')
+    valid = ~np.isnan(values)
+    sums = indicator @ np.where(valid, values, 0.0)
+    counts = indicator @ valid.astype('float64')
+    return np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+
+
+def derived_series(dates, observed):
+    """Every derived series of daily `observed` values (date x column) on `dates`."""
+    weekdays = pd.DatetimeIndex(dates).weekday.to_numpy()
+    series = {'observed': observed}
+    for window in ROLLING_WINDOWS:
+        series[f'rolling_{window}'] = rolling_mean(observed, window)
+
+    # Hari dengan pola sendiri (mis. akhir pekan) digeser ke rata-rata keseluruhan
+    profile = weekday_profile(observed, weekdays)
+    series['weekday_adjusted'] = observed - (profile - np.nanmean(profile, axis=0))[weekdays]
+
+    delta = np.full(observed.shape, np.nan)
+    delta[PERIOD:] = observed[PERIOD:] - observed[:-PERIOD]
+    series['wow_delta'] = delta
+
+    trend = centered_mean(observed, PERIOD)
+    seasonal_profile = weekday_profile(observed - trend, weekdays)
+    seasonal_profile -= np.nanmean(seasonal_profile, axis=0)
+    series['trend'] = trend
+    series['seasonal'] = seasonal_profile[weekdays]
+    series['residual'] = observed - trend - series['seasonal']
+    return series
+
+
+class SeriesAnalytics:
+    """Derived daily series of one metric, built per hierarchy node on first request.
+
+    A node's rows are laid on a daily date axis from its first to its last
+    report (NaN for missing days), so memory grows with the nodes that are
+    viewed, not with the length of the sub-region tail.
+    """
+
+    def __init__(self, index, metric, max_nodes=MAX_NODES):
+        self.index = index
+        self.metric = metric
+        self.max_nodes = max_nodes
+        self._nodes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def node(self, path):
+        """(dates, {series name: values}) of one node; empty arrays for an unknown node."""
+        with self._lock:
+            if path in self._nodes:
+                self._nodes.move_to_end(path)
+                return self._nodes[path]
+
+        # Dihitung di luar lock; dua sesi yang meminta node sama paling buruk menghitung dua kali
+        rows = self.index.query(path, pd.Timestamp.min, pd.Timestamp.max)
+        if rows.empty:
+            dates = np.array([], dtype='datetime64[ns]')
+            result = dates, derived_series(dates, np.empty((0, 1)))
+        else:
+            dates = pd.date_range(rows['date'].min(), rows['date'].max(), freq='D').to_numpy()
+            observed = np.full((len(dates), 1), np.nan)
+            positions = np.searchsorted(dates, rows['date'].to_numpy())
+            observed[positions, 0] = rows[self.metric].to_numpy(dtype='float64', na_value=np.nan)
+            result = dates, derived_series(dates, observed)
+        with self._lock:
+            self._nodes[path] = result
+            while len(self._nodes) > self.max_nodes:
+                self._nodes.popitem(last=False)
+        return result
+
+    def frame(self, path, start_date, end_date, names):
+        """Wide frame (date + one column per series name) for one node inside the window."""
+        dates, series = self.node(path)
+        lo = np.searchsorted(dates, pd.Timestamp(start_date).to_datetime64(), side='left')
+        hi = np.searchsorted(dates, pd.Timestamp(end_date).to_datetime64(), side='right')
+        data = {'date': dates[lo:hi]}
+        for name in names:
+            data[name] = series[name][lo:hi, 0]
+        return pd.DataFrame(data)
+
+
+def metric_label(metric):
+    return metric.replace('_percent_change_from_baseline', '').replace('_', ' ').capitalize()
+
+
+def overlay_frame(path, start_date, end_date, metrics, labels):
+    """Selected overlays (keys of OVERLAYS) of each metric, one column per pair, or None."""
+    if not labels:
+        return None
+    frame = None
+    for metric in metrics:
+        part = get_series_analytics(metric).frame(path, start_date, end_date, [OVERLAYS[label] for label in labels])
+        part.columns = ['date'] + [f"{metric_label(metric)}, {label.lower()}" for label in labels]
+        frame = part if frame is None else frame.merge(part, on='date', how='outer')
+    return frame
+
+
+@lru_cache(maxsize=8)
+def _build(signature, metric):
+    return SeriesAnalytics(get_hierarchy_index(), metric)
+
+
+def get_series_analytics(metric):
+    """SeriesAnalytics of `metric` over the current dataset, one per dataset version."""
+    return _build(dataset_signature(), metric)